@@ -8,40 +8,122 @@
 #define CHECK_CONTIGUOUS(x) AT_ASSERTM(x.is_contiguous(), #x " must be contiguous")
 #define CHECK_INPUT(x) CHECK_CUDA(x); CHECK_CONTIGUOUS(x)
 #define CHECK_DEVICE(x, y) AT_ASSERTM(x.device().index() == y.device().index(), #x " and " #y " must be in same CUDA device")
+#define CHECK_SAME_DTYPE(x, y) AT_ASSERTM(x.scalar_type() == y.scalar_type(), #x " and " #y " must be of same dtype")
+// Spikes can be stored as uint8 if there cannot be more than 255 per time step
+#define CHECK_SPIKE_DTYPE(spikes, x, maxNumSpikes) AT_ASSERTM( \
+	spikes.scalar_type() == x.scalar_type() || \
+	(spikes.scalar_type() == torch::kUInt8 && maxNumSpikes <= 255), \
+	#spikes " must be of same dtype as " #x ", or uint8 if maxNumSpikes <= 255")
+#define CHECK_TIME_SERIES(x) AT_ASSERTM(x.dim() == 2 || x.dim() == 3, #x " must be 2D or 3D")
+// Optional scalar int64 tensor to which the total number of spikes is added
+#define CHECK_SPIKE_COUNT(count, x) if (count.has_value()){ \
+	CHECK_INPUT(count.value()); \
+	CHECK_DEVICE(x, count.value()); \
+	AT_ASSERTM(count.value().scalar_type() == torch::kInt64 && count.value().numel() == 1, \
+		#count " must be a single int64 element"); \
+	}
+
+// Dimensions of tensors with states over time, which are either 2D
+// (nNeurons x nTimesteps) or 3D (nBatches x nTimesteps x nInner). See layout.h
+
+unsigned numInner(const torch::Tensor& x)
+{
+	return x.dim() == 3 ? x.size(2) : 1;
+}
+
+unsigned numNeurons(const torch::Tensor& x)
+{
+	return x.size(0) * numInner(x);
+}
+
+unsigned numTimesteps(const torch::Tensor& x)
+{
+	return x.size(1);
+}
+
+// Pointer to optional float tensor, nullptr if not provided
+const float* optionalPtr(const c10::optional<torch::Tensor>& x)
+{
+	if (!x.has_value())	return nullptr;
+	return x.value().data_ptr<float>();
+}
+
+// Pointer to optional float32 output with one element per neuron, nullptr if not provided
+float* perNeuronOutputPtr(
+	const c10::optional<torch::Tensor>& x, const torch::Tensor& like, unsigned nNeurons, const char* name)
+{
+	if (!x.has_value())	return nullptr;
+	const torch::Tensor& out = x.value();
+	AT_ASSERTM(out.is_cuda() && out.is_contiguous(), name, " must be a contiguous CUDA tensor");
+	AT_ASSERTM(out.device().index() == like.device().index(),
+		name, " must be on the same CUDA device as the input");
+	AT_ASSERTM(out.scalar_type() == torch::kFloat32, name, " must be float32");
+	AT_ASSERTM(out.numel() == nNeurons, name, " must be of shape (nNeurons,)");
+	return out.data_ptr<float>();
+}
+
+// Packed float32 parameters of shape (nRows, 4), with rows repeated along the
+// neuron index. See PackedParams in layout.h
+PackedParams packedParams(
+	const torch::Tensor& params, const torch::Tensor& like, unsigned nNeurons)
+{
+	CHECK_INPUT(params);
+	CHECK_DEVICE(like, params);
+	AT_ASSERTM(params.scalar_type() == torch::kFloat32, "params must be float32");
+	AT_ASSERTM(params.dim() == 2 && params.size(1) == 4, "params must be of shape (nRows, 4)");
+	unsigned nRows = params.size(0);
+	AT_ASSERTM(nRows > 0 && nNeurons % nRows == 0, "number of rows of params must divide nNeurons");
+	AT_ASSERTM(
+		reinterpret_cast<uintptr_t>(params.data_ptr()) % sizeof(float4) == 0,
+		"params must be aligned to 16 bytes");
+	return PackedParams{reinterpret_cast<const float4*>(params.data_ptr<float>()), nRows};
+}
+
+// Pointer to optional spike counter, nullptr if not provided
+unsigned long long* spikeCountPtr(const c10::optional<torch::Tensor>& count)
+{
+	if (!count.has_value())	return nullptr;
+	return reinterpret_cast<unsigned long long*>(count.value().data_ptr<int64_t>());
+}
 
 // LIF dynamics
 
 void lifForward(
 	const torch::Tensor& outputSpikes,
 	const torch::Tensor& vmem,
+	const c10::optional<torch::Tensor>& vmemLast,
 	const torch::Tensor& input,
+	const torch::Tensor& params,
 	const torch::Tensor& vmemPostInitial,
-    	const torch::Tensor& alpha,
-	const torch::Tensor& membrSubtract,
 	const float theta,
 	const float thetaLow,
 	const bool applyThetaLow,
-	const int maxNumSpikes)
+	const int maxNumSpikes,
+	const bool normInput,
+	const c10::optional<torch::Tensor>& spikeCount)
 {
 	CHECK_INPUT(input);
 	CHECK_INPUT(outputSpikes);
 	CHECK_INPUT(vmem);
 	CHECK_INPUT(vmemPostInitial);
-	CHECK_INPUT(alpha);
-	CHECK_INPUT(membrSubtract);
 
 	// check if tensors are on same device
 	CHECK_DEVICE(input, vmem);
 	CHECK_DEVICE(input, outputSpikes);
 	CHECK_DEVICE(input, vmemPostInitial);
-	CHECK_DEVICE(input, alpha);
-	CHECK_DEVICE(input, membrSubtract);
 
 	// set the current cuda device to wherever the tensor input resides
 	cudaSetDevice(input.device().index());
 
-	unsigned nTimesteps = input.size(-1);
-	unsigned nNeurons = input.size(0);
+	CHECK_TIME_SERIES(input);
+	unsigned nTimesteps = numTimesteps(input);
+	unsigned nNeurons = numNeurons(input);
+	unsigned nInner = numInner(input);
+
+	PackedParams paramsArg = packedParams(params, input, nNeurons);
+	float* vmemLastPtr = perNeuronOutputPtr(vmemLast, input, nNeurons, "vmemLast");
+	AT_ASSERTM(vmemPostInitial.numel() == nNeurons, "vmemPostInitial must be of shape (nNeurons,)");
+	AT_ASSERTM(vmemPostInitial.scalar_type() == torch::kFloat32, "vmemPostInitial must be float32");
 
 	// convert maxNumSpikes to usnigned (-1 will become max)
 	unsigned maxNumSpikesU = maxNumSpikes;
@@ -51,104 +133,198 @@ void lifForward(
 	// // membrane potential
 	// auto vmem = torch::empty_like(input);
 
-	lifForwardCuda<float>(
-		outputSpikes.data_ptr<float>(),
-		vmem.data_ptr<float>(),
-		input.data_ptr<float>(),
-		vmemPostInitial.data_ptr<float>(),
-		alpha.data_ptr<float>(),
-		membrSubtract.data_ptr<float>(),
-		theta, thetaLow, applyThetaLow, maxNumSpikesU, nNeurons, nTimesteps);
+	// Input and outputs can be of reduced precision, states are always float
+	CHECK_SPIKE_DTYPE(outputSpikes, input, maxNumSpikesU);
+	CHECK_SAME_DTYPE(input, vmem);
+	CHECK_SPIKE_COUNT(spikeCount, input);
+
+	AT_DISPATCH_FLOATING_TYPES_AND2(
+		at::ScalarType::Half, at::ScalarType::BFloat16, input.scalar_type(), "lifForward", ([&] {
+		auto launch = [&](auto* outputSpikesPtr) {
+			lifForwardCuda<scalar_t>(
+				outputSpikesPtr,
+				vmem.data_ptr<scalar_t>(),
+				vmemLastPtr,
+				input.data_ptr<scalar_t>(),
+				paramsArg,
+				vmemPostInitial.data_ptr<float>(),
+				theta, thetaLow, applyThetaLow, maxNumSpikesU, normInput, spikeCountPtr(spikeCount),
+				nNeurons, nTimesteps, nInner);
+		};
+		if (outputSpikes.scalar_type() == torch::kUInt8){
+			launch(outputSpikes.data_ptr<uint8_t>());
+		} else {
+			launch(outputSpikes.data_ptr<scalar_t>());
+		}
+	}));
 
 	return;
 }
 
-torch::Tensor lifBackward(
-	const torch::Tensor& surr,
-	const torch::Tensor& outputGrad,
-	const torch::Tensor& notClipped,
-	const torch::Tensor& alpha,
-	const torch::Tensor& membrSubtract)
+void lifSynForward(
+	const torch::Tensor& outputSpikes,
+	const torch::Tensor& vmem,
+	const c10::optional<torch::Tensor>& vmemLast,
+	const c10::optional<torch::Tensor>& iSyn,
+	const torch::Tensor& iSynLast,
+	const torch::Tensor& input,
+	const torch::Tensor& params,
+	const torch::Tensor& vmemPostInitial,
+	const torch::Tensor& iSynInitial,
+	const float theta,
+	const float thetaLow,
+	const bool applyThetaLow,
+	const int maxNumSpikes,
+	const bool normInput,
+	const bool decayEarly,
+	const c10::optional<torch::Tensor>& spikeCount)
 {
-	CHECK_INPUT(surr);
-	CHECK_INPUT(outputGrad);
-	CHECK_INPUT(notClipped);
-	CHECK_INPUT(alpha);
-	CHECK_INPUT(membrSubtract);
+	CHECK_INPUT(input);
+	CHECK_INPUT(outputSpikes);
+	CHECK_INPUT(vmem);
+	CHECK_INPUT(iSynLast);
+	CHECK_INPUT(vmemPostInitial);
+	CHECK_INPUT(iSynInitial);
 
 	// check if tensors are on same device
-	CHECK_DEVICE(surr, outputGrad);
-	CHECK_DEVICE(surr, notClipped);
-	CHECK_DEVICE(surr, alpha);
-	CHECK_DEVICE(surr, membrSubtract);
+	CHECK_DEVICE(input, vmem);
+	CHECK_DEVICE(input, outputSpikes);
+	CHECK_DEVICE(input, iSynLast);
+	CHECK_DEVICE(input, vmemPostInitial);
+	CHECK_DEVICE(input, iSynInitial);
 
-	// set the current cuda device to wherever the tensor surr resides
-	cudaSetDevice(surr.device().index());
+	// convert maxNumSpikes to usnigned (-1 will become max)
+	unsigned maxNumSpikesU = maxNumSpikes;
 
-	unsigned nTimesteps = surr.size(-1);
-	unsigned nNeurons = surr.size(0);
+	// Input and outputs can be of reduced precision, states are always float
+	CHECK_SPIKE_DTYPE(outputSpikes, input, maxNumSpikesU);
+	CHECK_SAME_DTYPE(input, vmem);
+	CHECK_SPIKE_COUNT(spikeCount, input);
+	AT_ASSERTM(iSynLast.scalar_type() == torch::kFloat32, "iSynLast must be float32");
 
-	// input gradients
-	auto inputGrad = torch::empty_like(surr);
+	// Synaptic currents are only written for all time steps if a tensor is provided
+	if (iSyn.has_value()){
+		CHECK_INPUT(iSyn.value());
+		CHECK_DEVICE(input, iSyn.value());
+		CHECK_SAME_DTYPE(input, iSyn.value());
+	}
 
-	lifBackwardCuda<float>(
-		inputGrad.data_ptr<float>(),
-		outputGrad.data_ptr<float>(),
-		surr.data_ptr<float>(),
-		notClipped.data_ptr<float>(),
-		alpha.data_ptr<float>(),
-		membrSubtract.data_ptr<float>(),
-		nNeurons, nTimesteps);
+	// set the current cuda device to wherever the tensor input resides
+	cudaSetDevice(input.device().index());
 
-	return inputGrad;
+	CHECK_TIME_SERIES(input);
+	unsigned nTimesteps = numTimesteps(input);
+	unsigned nNeurons = numNeurons(input);
+	unsigned nInner = numInner(input);
+
+	PackedParams paramsArg = packedParams(params, input, nNeurons);
+	float* vmemLastPtr = perNeuronOutputPtr(vmemLast, input, nNeurons, "vmemLast");
+	AT_ASSERTM(vmemPostInitial.numel() == nNeurons, "vmemPostInitial must be of shape (nNeurons,)");
+	AT_ASSERTM(vmemPostInitial.scalar_type() == torch::kFloat32, "vmemPostInitial must be float32");
+	AT_ASSERTM(iSynInitial.numel() == nNeurons, "iSynInitial must be of shape (nNeurons,)");
+	AT_ASSERTM(iSynInitial.scalar_type() == torch::kFloat32, "iSynInitial must be float32");
+
+	AT_DISPATCH_FLOATING_TYPES_AND2(
+		at::ScalarType::Half, at::ScalarType::BFloat16, input.scalar_type(), "lifSynForward", ([&] {
+		auto launch = [&](auto* outputSpikesPtr) {
+			lifSynForwardCuda<scalar_t>(
+				outputSpikesPtr,
+				vmem.data_ptr<scalar_t>(),
+				vmemLastPtr,
+				iSyn.has_value() ? iSyn.value().data_ptr<scalar_t>() : nullptr,
+				iSynLast.data_ptr<float>(),
+				input.data_ptr<scalar_t>(),
+				paramsArg,
+				vmemPostInitial.data_ptr<float>(),
+				iSynInitial.data_ptr<float>(),
+				theta, thetaLow, applyThetaLow, maxNumSpikesU, normInput, decayEarly,
+				spikeCountPtr(spikeCount), nNeurons, nTimesteps, nInner);
+		};
+		if (outputSpikes.scalar_type() == torch::kUInt8){
+			launch(outputSpikes.data_ptr<uint8_t>());
+		} else {
+			launch(outputSpikes.data_ptr<scalar_t>());
+		}
+	}));
+
+	return;
 }
 
-torch::Tensor lifBackwardAlpha(
+torch::Tensor lifBackward(
 	const torch::Tensor& surr,
 	const torch::Tensor& outputGrad,
-	const torch::Tensor& vmemPost,
-	const torch::Tensor& vmemPostInitial,
-	const torch::Tensor& notClipped,
-	const torch::Tensor& alpha,
-	const torch::Tensor& membrSubtract)
+	const c10::optional<torch::Tensor>& notClipped,
+	const torch::Tensor& state,
+	const c10::optional<torch::Tensor>& alphaGrad,
+	const c10::optional<torch::Tensor>& vmemPost,
+	const c10::optional<torch::Tensor>& vmemPostInitial)
 {
 	CHECK_INPUT(surr);
 	CHECK_INPUT(outputGrad);
-	CHECK_INPUT(vmemPost);
-	CHECK_INPUT(vmemPostInitial);
-	CHECK_INPUT(notClipped);
-	CHECK_INPUT(alpha);
-	CHECK_INPUT(membrSubtract);
+	CHECK_INPUT(state);
+
+	// state holds (alpha, membrSubtract), with rows repeated along the neuron index
+	AT_ASSERTM(state.dim() == 2 && state.size(1) == 2, "state must be of shape (nRows, 2)");
+	AT_ASSERTM(state.scalar_type() == torch::kFloat32, "state must be float32");
+	AT_ASSERTM(
+		reinterpret_cast<uintptr_t>(state.data_ptr()) % sizeof(float2) == 0,
+		"state must be aligned to 8 bytes");
 
 	// check if tensors are on same device
 	CHECK_DEVICE(surr, outputGrad);
-	CHECK_DEVICE(surr, vmemPost);
-	CHECK_DEVICE(surr, vmemPostInitial);
-	CHECK_DEVICE(surr, notClipped);
-	CHECK_DEVICE(surr, alpha);
-	CHECK_DEVICE(surr, membrSubtract);
+	CHECK_DEVICE(surr, state);
+
+	// Without lower bound on vmem, no clipping mask is needed
+	if (notClipped.has_value()){
+		CHECK_INPUT(notClipped.value());
+		CHECK_DEVICE(surr, notClipped.value());
+	}
+
+	// Alpha gradients are computed in the same pass if an output tensor is provided
+	float* alphaGradPtr = nullptr;
+	const float* vmemPostPtr = nullptr;
+	const float* vmemPostInitialPtr = nullptr;
+	if (alphaGrad.has_value()){
+		AT_ASSERTM(vmemPost.has_value() && vmemPostInitial.has_value(),
+			"vmemPost and vmemPostInitial are required for alpha gradients");
+		CHECK_INPUT(alphaGrad.value());
+		CHECK_INPUT(vmemPost.value());
+		CHECK_INPUT(vmemPostInitial.value());
+		CHECK_DEVICE(surr, alphaGrad.value());
+		CHECK_DEVICE(surr, vmemPost.value());
+		CHECK_DEVICE(surr, vmemPostInitial.value());
+		alphaGradPtr = alphaGrad.value().data_ptr<float>();
+		vmemPostPtr = vmemPost.value().data_ptr<float>();
+		vmemPostInitialPtr = vmemPostInitial.value().data_ptr<float>();
+	}
 
 	// set the current cuda device to wherever the tensor surr resides
 	cudaSetDevice(surr.device().index());
 
-	unsigned nTimesteps = surr.size(-1);
-	unsigned nNeurons = surr.size(0);
+	CHECK_TIME_SERIES(surr);
+	unsigned nTimesteps = numTimesteps(surr);
+	unsigned nNeurons = numNeurons(surr);
+	unsigned nInner = numInner(surr);
+
+	unsigned nStateRows = state.size(0);
+	AT_ASSERTM(nStateRows > 0 && nNeurons % nStateRows == 0,
+		"number of rows of state must divide nNeurons");
 
 	// input gradients
-	auto alphaGrad = torch::empty_like(alpha);
+	auto inputGrad = torch::empty_like(surr);
 
-	lifBackwardAlphaCuda<float>(
-		alphaGrad.data_ptr<float>(),
+	lifBackwardCuda<float>(
+		inputGrad.data_ptr<float>(),
+		alphaGradPtr,
 		outputGrad.data_ptr<float>(),
-		vmemPost.data_ptr<float>(),
-		vmemPostInitial.data_ptr<float>(),
 		surr.data_ptr<float>(),
-		notClipped.data_ptr<float>(),
-		alpha.data_ptr<float>(),
-		membrSubtract.data_ptr<float>(),
-		nNeurons, nTimesteps);
+		optionalPtr(notClipped),
+		vmemPostPtr,
+		vmemPostInitialPtr,
+		reinterpret_cast<const float2*>(state.data_ptr<float>()),
+		nStateRows, nNeurons, nTimesteps, nInner);
 
-	return alphaGrad;
+	return inputGrad;
 }
 
 
@@ -170,8 +346,10 @@ torch::Tensor leakyForward(
 	// set the current cuda device to wherever the tensor vmemInitial resides
 	cudaSetDevice(vmemInitial.device().index());
 
-	unsigned nTimesteps = input.size(-1);
-	unsigned nNeurons = input.size(0);
+	CHECK_TIME_SERIES(input);
+	unsigned nTimesteps = numTimesteps(input);
+	unsigned nNeurons = numNeurons(input);
+	unsigned nInner = numInner(input);
 
 	// Tensor to store membrane potential
 	auto vmemFull = torch::empty_like(input);
@@ -181,7 +359,7 @@ torch::Tensor leakyForward(
 		input.data_ptr<float>(),
 		vmemInitial.data_ptr<float>(),
 		alpha.data_ptr<float>(),
-		nNeurons, nTimesteps);
+		nNeurons, nTimesteps, nInner);
 
 	return vmemFull;
 }
@@ -199,8 +377,10 @@ torch::Tensor leakyBackward(
 	// set the current cuda device to wherever the tensor outputGrad resides
 	cudaSetDevice(outputGrad.device().index());
 
-	unsigned nTimesteps = outputGrad.size(-1);
-	unsigned nNeurons = outputGrad.size(0);
+	CHECK_TIME_SERIES(outputGrad);
+	unsigned nTimesteps = numTimesteps(outputGrad);
+	unsigned nNeurons = numNeurons(outputGrad);
+	unsigned nInner = numInner(outputGrad);
 
 	// Tensor to store input gradient
 	auto inputGrad = torch::empty_like(outputGrad);
@@ -209,7 +389,7 @@ torch::Tensor leakyBackward(
 		inputGrad.data_ptr<float>(),
 		outputGrad.data_ptr<float>(),
 		alpha.data_ptr<float>(),
-		nNeurons, nTimesteps);
+		nNeurons, nTimesteps, nInner);
 
 	return inputGrad;
 }
@@ -233,8 +413,10 @@ torch::Tensor leakyBackwardAlpha(
 	// set the current cuda device to wherever the tensor outputGrad resides
 	cudaSetDevice(outputGrad.device().index());
 
-	unsigned nTimesteps = outputGrad.size(-1);
-	unsigned nNeurons = outputGrad.size(0);
+	CHECK_TIME_SERIES(outputGrad);
+	unsigned nTimesteps = numTimesteps(outputGrad);
+	unsigned nNeurons = numNeurons(outputGrad);
+	unsigned nInner = numInner(outputGrad);
 
 	// Tensor to store alpha gradient
 	auto alphaGrad = torch::zeros_like(alpha);
@@ -245,7 +427,7 @@ torch::Tensor leakyBackwardAlpha(
 		output.data_ptr<float>(),
 		vmemInitial.data_ptr<float>(),
 		alpha.data_ptr<float>(),
-		nNeurons, nTimesteps);
+		nNeurons, nTimesteps, nInner);
 
 	return alphaGrad;
 }
@@ -321,17 +503,21 @@ torch::Tensor spikeBackwardRefrCuda(
 torch::Tensor spikeBackward(
 	const torch::Tensor& surr,
 	const torch::Tensor& outputGrad,
-	const torch::Tensor& notClipped,
+	const c10::optional<torch::Tensor>& notClipped,
 	const float alpha,
 	const float membrSubtract)
 {
 	CHECK_INPUT(surr);
 	CHECK_INPUT(outputGrad);
-	CHECK_INPUT(notClipped);
 
 	// check if tensors are on same device
 	CHECK_DEVICE(surr, outputGrad);
-	CHECK_DEVICE(surr, notClipped);
+
+	// Without lower bound on vmem, no clipping mask is needed
+	if (notClipped.has_value()){
+		CHECK_INPUT(notClipped.value());
+		CHECK_DEVICE(surr, notClipped.value());
+	}
 
 	// set the current cuda device to wherever the tensor d_u resides
 	cudaSetDevice(surr.device().index());
@@ -346,7 +532,7 @@ torch::Tensor spikeBackward(
 		inputGrad.data_ptr<float>(),
 		outputGrad.data_ptr<float>(),
 		surr.data_ptr<float>(),
-		notClipped.data_ptr<float>(),
+		optionalPtr(notClipped),
 		alpha, membrSubtract, nNeurons, nTimesteps);
 
 	return inputGrad;
@@ -358,9 +544,9 @@ PYBIND11_MODULE(TORCH_EXTENSION_NAME, m)
 	m.def("spikeForward"     ,  &spikeForward     , "Spike generation forward pass");
 	m.def("spikeBackward"    ,  &spikeBackward    ,	"Spike generation backward pass");
 	m.def("spikeBackwardRefr",  &spikeBackwardRefrCuda,	"Spike generation backward pass for arbitrary refractory response");
-	m.def("lifBackward"      ,  &lifBackward      , "LIF backward pass");
-	m.def("lifBackwardAlpha" ,  &lifBackwardAlpha , "LIF backward pass for alphas");
+	m.def("lifBackward"      ,  &lifBackward      , "LIF backward pass, optionally for alphas");
 	m.def("lifForward" 	     ,  &lifForward       , "LIF forward dynamics");
+	m.def("lifSynForward"    ,  &lifSynForward    , "LIF forward dynamics with exponential synapses");
 	m.def("leakyForward"     ,  &leakyForward     ,	"Forward pass of leaky integrator");
 	m.def("leakyBackward"    ,  &leakyBackward    ,	"Backward pass of leaky integrator");
 	m.def("leakyBackwardAlpha", &leakyBackwardAlpha,"Backward pass of leaky integrator for alphas");
@@ -9,6 +9,7 @@
 #define EXPERIMENTALKERNELS_H_INCLUDED
 
 #include <stdio.h>
+#include "layout.h"
 
 // Kernel functions
 
@@ -87,7 +88,8 @@ __global__ void spikeForwardKernel(
  * 					input gradients are to be written
  * @param outputGrad 2D-tensor (nNeurons x nTimesteps) that holds the given output gradients
  * @param surr 2D-tensor (nNeurons x nTimesteps) with the given surrogate gradients ds_t/dV_t for each t
- * @param notClipped 2D-tensor (nNeurons x nTimesteps) with the given surrogate gradients ds_t/dV_t for each t
+ * @param notClipped 2D-tensor (nNeurons x nTimesteps) indicating whether vmem has been clipped.
+ * 					 nullptr if vmem is not clipped.
  * @param membrSubtract Value that is subtracted from the membrane potential when spiking
  * @param nNeurons Number of neurons/batches
  * @param nTimesteps Number of timesteps
@@ -120,11 +122,11 @@ __global__ void spikeBackwardKernel(
 
 	// First summand of input gradient is surrogate gradient * output gradient
 	// Corresponds to j=i
-	inputGrad[inputGradID] = surr[linearID] * notClipped[linearID] * outputGrad[inputGradID];
+	inputGrad[inputGradID] = surr[linearID] * maskValue(notClipped, linearID) * outputGrad[inputGradID];
 
 	// The product over k in the formula in the function description. Will be incremented
 	// iteratively while looping over j in the sum
-	float gradProd = surr[linearID] * notClipped[linearID] * membrSubtract;
+	float gradProd = surr[linearID] * maskValue(notClipped, linearID) * membrSubtract;
 
 	// Iterate over sum, over different derivative enumerators.
 	// Stop early when accumulated product is 0
@@ -134,10 +136,11 @@ __global__ void spikeBackwardKernel(
 		linearID = j + linearRowID;
 
 		// New summand to inputGrad_i
-		inputGrad[inputGradID] -= outputGrad[linearID] * surr[linearID] * notClipped[linearID] * gradProd;
+		float notClippedJ = maskValue(notClipped, linearID);
+		inputGrad[inputGradID] -= outputGrad[linearID] * surr[linearID] * notClippedJ * gradProd;
 
 		// Update product for next step
-		gradProd *= (alpha - membrSubtract * notClipped[linearID] * surr[linearID]);
+		gradProd *= (alpha - membrSubtract * notClippedJ * surr[linearID]);
 	}
 }
 
@@ -304,7 +307,7 @@ void spikeForwardCuda(
  * @param surr 2D-tensor (nNeurons x nTimesteps) with the given surrogate gradients ds_t/dV_t for each t
  * @param notClipped 2D-tensor (nNeurons x nTimesteps) indicating for each time step whether the
  * 					 membrane potential has been clipped to a constant, which will
- * 					 result in 0 gradients at this point.
+ * 					 result in 0 gradients at this point. nullptr if there is no lower bound.
  * @param membrSubtract Value that is subtracted from the membrane potential when spiking
  * @param nNeurons Number of neurons/batches
  * @param nTimesteps Number of timesteps
@@ -340,7 +343,7 @@ void spikeBackwardCuda(
 		spikeBackwardKernel<scalarType><<< block, thread >>>( inputGrad + startOffset * nTimesteps,
 													outputGrad  + startOffset * nTimesteps,
 													surr + startOffset * nTimesteps,
-													notClipped + startOffset * nTimesteps,
+													notClipped == nullptr ? nullptr : notClipped + startOffset * nTimesteps,
 													alpha, membrSubtract, neuronsInGrid, nTimesteps);
 	}
 }
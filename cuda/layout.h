@@ -0,0 +1,72 @@
+/*
+ * Author: Felix Bauer
+ * Memory layout of tensors that hold neuron states over time.
+ *
+ * Such tensors are either 2D, with shape (nNeurons x nTimesteps), or 3D, with shape
+ * (nBatches x nTimesteps x nInner), where nInner is the product of all trailing
+ * dimensions of the layer input. The latter corresponds to the original layout of
+ * the input to a layer, so that no transposed copy is required. In both cases
+ * neuron `neuronID` is the row-major flattened index over all non-time dimensions.
+ * 2D tensors are treated as the special case nInner = 1.
+ */
+#ifndef LAYOUT_H_INCLUDED
+#define LAYOUT_H_INCLUDED
+
+
+/** Index of the first time step of a neuron
+ *
+ * @param neuronID Index of the neuron
+ * @param nTimesteps Number of timesteps
+ * @param nInner Number of neurons per batch. Also the stride between time steps
+ */
+__device__ __forceinline__ unsigned rowOffset(
+	unsigned neuronID,
+	unsigned nTimesteps,
+	unsigned nInner)
+{
+	return (neuronID / nInner) * nTimesteps * nInner + neuronID % nInner;
+}
+
+
+/** Element of an optional mask with the same layout as the state tensors
+ *
+ * Masks such as notClipped are only allocated where they can differ from 1.
+ * Otherwise a nullptr is passed, which reads as 1 everywhere.
+ *
+ * @param mask Pointer to the mask or nullptr
+ * @param index Linear index of the element
+ */
+template <class scalarType>
+__device__ __forceinline__ float maskValue(
+	const scalarType* __restrict__ mask,
+	unsigned index)
+{
+	return (mask == nullptr) ? 1.0f : (float) mask[index];
+}
+
+
+/** Per-neuron parameters of the LIF forward kernels, packed as float4
+ *
+ * Each row holds (alpha, membrSubtract, alphaSyn, 1 - alpha) for one neuron, such
+ * that a thread loads all of them with a single 128-bit access. alphaSyn is only
+ * read by kernels with synaptic dynamics.
+ *
+ * Parameters are usually the same for all batches, or even for all neurons. Rows
+ * are therefore repeated along the neuron index: with nRows rows, neuron
+ * `neuronID` reads row neuronID % nRows. nRows is 1 for parameters that are shared
+ * by all neurons, the number of neurons per batch for parameters that are shared
+ * by all batches, and nNeurons otherwise.
+ */
+struct PackedParams
+{
+	const float4* __restrict__ data;
+	unsigned nRows;
+
+	__device__ __forceinline__ float4 operator[](unsigned neuronID) const
+	{
+		return data[neuronID % nRows];
+	}
+};
+
+
+#endif // LAYOUT_H_INCLUDED
@@ -3,15 +3,51 @@
  * Contains routines to compute forward and backward passes
  * for the following neuron dynamics
  * - non-spiking leaky integrator
+ *
+ * Tensors that hold states over time can be 2D or 3D, as described in layout.h.
  */
 #ifndef LEAKYKERNELS_H_INCLUDED
 #define LEAKYKERNELS_H_INCLUDED
 
 #include <stdio.h>
+#include <mutex>
+#include <unordered_map>
+#include "layout.h"
+
+#define FULL_WARP_MASK 0xffffffff
 
 // Kernel functions
 
 
+/** Warp-wide scan of the linear recurrence y_k = a_k * y_{k-1} + b_k
+ *
+ * Each lane holds one element (a_k, b_k). Elements are combined with the associative
+ * operator (a1, b1) o (a2, b2) = (a1 * a2, a2 * b1 + b2), so that after log2(warpSize)
+ * steps each lane holds the recurrence evaluated up to its own position. All lanes
+ * of the warp must participate.
+ *
+ * @param a Factor of current lane
+ * @param b Summand of current lane
+ * @param carry Value of y before the first lane (y_{-1})
+ * @return y at the position of the current lane
+ */
+__device__ __forceinline__ float warpLinearScan(float a, float b, float carry)
+{
+	unsigned lane = threadIdx.x % warpSize;
+
+	for(unsigned offset=1; offset<warpSize; offset <<= 1){
+		float aPrev = __shfl_up_sync(FULL_WARP_MASK, a, offset);
+		float bPrev = __shfl_up_sync(FULL_WARP_MASK, b, offset);
+		if(lane >= offset){
+			b = a * bPrev + b;
+			a = a * aPrev;
+		}
+	}
+
+	return b + a * carry;
+}
+
+
 /** Forward kernel for leaky integrator dynamic.
  * 	
  * Forward evolution for (leaky) integrator dynamic, over time.
@@ -25,6 +61,7 @@
  * 		  For IAF neurons set to 1.
  * @param nNeurons Number of neurons/batches
  * @param nTimesteps Number of timesteps
+ * @param nInner Number of neurons per batch (stride between time steps)
 **/
 template <class scalarType>
 __global__ void leakyForwardKernel(
@@ -33,12 +70,16 @@ __global__ void leakyForwardKernel(
 	const scalarType* __restrict__ vmemInitial,
 	const scalarType* __restrict__ alpha,
 	unsigned nNeurons,
-	unsigned nTimesteps)
+	unsigned nTimesteps,
+	unsigned nInner)
 {
 	unsigned neuronID = blockIdx.x * blockDim.x + threadIdx.x;
 
 	if(neuronID >= nNeurons)	return;
 
+	// Index of first time step for current neuron
+	unsigned linearRowID = rowOffset(neuronID, nTimesteps, nInner);
+
 	scalarType vmemCurr = vmemInitial[neuronID];
 
 	for(unsigned t=0; t<nTimesteps; ++t){
@@ -47,7 +88,7 @@ __global__ void leakyForwardKernel(
 		vmemCurr *= alpha[neuronID];
 
 		// ID of neuron and current timestep
-		unsigned linearID = t + neuronID * nTimesteps;
+		unsigned linearID = linearRowID + t * nInner;
 
 		// Add current input to vmemCurr
 		vmemCurr += input[linearID];
@@ -59,6 +100,57 @@ __global__ void leakyForwardKernel(
 }
 
 
+/** Forward kernel for leaky integrator dynamic, parallel over time.
+ *
+ * Same as leakyForwardKernel, but each neuron is processed by one warp. Time steps
+ * are processed in chunks of warpSize, each of which is evaluated with a parallel
+ * scan. This reduces the sequential depth from nTimesteps to
+ * nTimesteps / warpSize * log2(warpSize), which pays off when there are too few
+ * neurons to occupy the GPU with one thread per neuron.
+ *
+ * See leakyForwardKernel for parameters.
+**/
+template <class scalarType>
+__global__ void leakyForwardScanKernel(
+	scalarType* __restrict__ vmemAll,
+	const scalarType* __restrict__ input,
+	const scalarType* __restrict__ vmemInitial,
+	const scalarType* __restrict__ alpha,
+	unsigned nNeurons,
+	unsigned nTimesteps,
+	unsigned nInner)
+{
+	unsigned neuronID = (blockIdx.x * blockDim.x + threadIdx.x) / warpSize;
+	unsigned lane = threadIdx.x % warpSize;
+
+	// Uniform across the warp
+	if(neuronID >= nNeurons)	return;
+
+	// Index of first time step for current neuron
+	unsigned linearRowID = rowOffset(neuronID, nTimesteps, nInner);
+
+	const float alphaCurr = alpha[neuronID];
+	float vmemCarry = vmemInitial[neuronID];
+
+	for(unsigned tStart=0; tStart<nTimesteps; tStart+=warpSize){
+
+		unsigned t = tStart + lane;
+		unsigned linearID = linearRowID + t * nInner;
+
+		float vmemCurr = warpLinearScan(
+			alphaCurr, (t < nTimesteps) ? input[linearID] : 0.0f, vmemCarry);
+
+		if(t < nTimesteps){
+			vmemAll[linearID] = vmemCurr;
+		}
+
+		// Last lane holds state at end of current chunk
+		vmemCarry = __shfl_sync(FULL_WARP_MASK, vmemCurr, warpSize - 1);
+	}
+
+}
+
+
 /** Backward kernel for leaky integrator dynamics.
  *
  * Using that 
@@ -78,6 +170,7 @@ __global__ void leakyForwardKernel(
  * 		  For IAF neurons set to 1.
  * @param nNeurons Number of neurons/batches
  * @param nTimesteps Number of timesteps
+ * @param nInner Number of neurons per batch (stride between time steps)
 **/
 template <class scalarType>
 __global__ void leakyBackwardKernel(
@@ -85,21 +178,22 @@ __global__ void leakyBackwardKernel(
 	const scalarType* __restrict__ outputGrad,
 	const scalarType* __restrict__ alpha,
 	unsigned nNeurons,
-	unsigned nTimesteps)
+	unsigned nTimesteps,
+	unsigned nInner)
 {
 	unsigned neuronID = blockIdx.x * blockDim.x + threadIdx.x;
 
 	if(neuronID >= nNeurons)	return;
 
-    // Index of first element in current row of 2D tensors (i.e. for current neuron)
-    unsigned linearRowID = neuronID * nTimesteps;
+	// Index of first time step for current neuron
+	unsigned linearRowID = rowOffset(neuronID, nTimesteps, nInner);
 
 	scalarType grad = 0;
 
 	for(unsigned t=nTimesteps-1; t<nTimesteps; --t){
 
 		// ID of neuron and current timestep
-		unsigned tIndex = t + linearRowID;
+		unsigned tIndex = linearRowID + t * nInner;
 
 		// Add corresponding element of outputGrad and multiply by alpha
 		grad = grad * alpha[neuronID] + outputGrad[tIndex];
@@ -111,6 +205,55 @@ __global__ void leakyBackwardKernel(
 }
 
 
+/** Backward kernel for leaky integrator dynamics, parallel over time.
+ *
+ * Same as leakyBackwardKernel, but each neuron is processed by one warp, evaluating
+ * chunks of warpSize time steps, from last to first, with a parallel scan.
+ * See leakyForwardScanKernel.
+ *
+ * See leakyBackwardKernel for parameters.
+**/
+template <class scalarType>
+__global__ void leakyBackwardScanKernel(
+	scalarType* __restrict__ inputGrad,
+	const scalarType* __restrict__ outputGrad,
+	const scalarType* __restrict__ alpha,
+	unsigned nNeurons,
+	unsigned nTimesteps,
+	unsigned nInner)
+{
+	unsigned neuronID = (blockIdx.x * blockDim.x + threadIdx.x) / warpSize;
+	unsigned lane = threadIdx.x % warpSize;
+
+	// Uniform across the warp
+	if(neuronID >= nNeurons)	return;
+
+	// Index of first time step for current neuron
+	unsigned linearRowID = rowOffset(neuronID, nTimesteps, nInner);
+
+	const float alphaCurr = alpha[neuronID];
+	float gradCarry = 0;
+
+	for(unsigned tStart=0; tStart<nTimesteps; tStart+=warpSize){
+
+		// Reversed time: lane 0 holds the latest time step of the chunk
+		bool valid = (tStart + lane) < nTimesteps;
+		unsigned t = nTimesteps - 1 - (tStart + lane);
+		unsigned tIndex = linearRowID + t * nInner;
+
+		float grad = warpLinearScan(
+			alphaCurr, valid ? outputGrad[tIndex] : 0.0f, gradCarry);
+
+		if(valid){
+			inputGrad[tIndex] = grad;
+		}
+
+		gradCarry = __shfl_sync(FULL_WARP_MASK, grad, warpSize - 1);
+	}
+
+}
+
+
 /** Backward kernel for alpha gradients in leaky integrator dynamics.
  *
  * The gradients are given by
@@ -129,6 +272,7 @@ __global__ void leakyBackwardKernel(
  * 		  For IAF neurons set to 1.
  * @param nNeurons Number of neurons/batches
  * @param nTimesteps Number of timesteps
+ * @param nInner Number of neurons per batch (stride between time steps)
 **/
 template <class scalarType>
 __global__ void leakyBackwardAlphaKernel(
@@ -138,14 +282,15 @@ __global__ void leakyBackwardAlphaKernel(
 	const scalarType* __restrict__ vmemInitial,
 	const scalarType* __restrict__ alpha,
 	unsigned nNeurons,
-	unsigned nTimesteps)
+	unsigned nTimesteps,
+	unsigned nInner)
 {
 	unsigned neuronID = blockIdx.x * blockDim.x + threadIdx.x;
 
 	if(neuronID >= nNeurons)	return;
 
-	// Index of first element in current row of 2D tensors (i.e. for current neuron)
-	unsigned linearRowID = neuronID * nTimesteps;
+	// Index of first time step for current neuron
+	unsigned linearRowID = rowOffset(neuronID, nTimesteps, nInner);
 
 	// At t=0, gradient is vmemInitial
 	scalarType grad = vmemInitial[neuronID];
@@ -154,10 +299,10 @@ __global__ void leakyBackwardAlphaKernel(
 	for(unsigned t=1; t<nTimesteps; ++t){
 
 		// 2D-index of neuron and current timestep
-		unsigned tIndex = t + linearRowID;
+		unsigned tIndex = linearRowID + t * nInner;
 
 		// Scale previous grad with alpha and add output at previous timestep
-		grad = alpha[neuronID] * grad + output[tIndex - 1];
+		grad = alpha[neuronID] * grad + output[tIndex - nInner];
 
 		// Add corresponding element of outputGrad and multiply by alpha
 		alphaGrad[neuronID] += grad * outputGrad[tIndex];
@@ -169,10 +314,56 @@ __global__ void leakyBackwardAlphaKernel(
 // Host functions
 
 
+/** Device attributes that determine how leaky dynamics are parallelized */
+struct DeviceLaunchInfo
+{
+	int nMultiprocessors;
+	// Warp size
+	int nLanes;
+};
+
+
+/** Launch attributes of the current device
+ *
+ * Device attributes do not change, so they are only queried once per device
+ * and not on every launch.
+ */
+inline DeviceLaunchInfo deviceLaunchInfo()
+{
+	static std::mutex cacheMutex;
+	static std::unordered_map<int, DeviceLaunchInfo> cache;
+
+	int device;
+	cudaGetDevice(&device);
+
+	std::lock_guard<std::mutex> lock(cacheMutex);
+	auto cached = cache.find(device);
+	if(cached != cache.end())	return cached->second;
+
+	DeviceLaunchInfo info;
+	cudaDeviceGetAttribute(&info.nMultiprocessors, cudaDevAttrMultiProcessorCount, device);
+	cudaDeviceGetAttribute(&info.nLanes, cudaDevAttrWarpSize, device);
+	cache[device] = info;
+	return info;
+}
+
+
+/** Whether to parallelize leaky dynamics over time rather than only over neurons
+ *
+ * One thread per neuron leaves most of the GPU idle if there are fewer neurons than
+ * can be run concurrently, in which case one warp per neuron is used instead.
+ * For short time series the sequential loop is cheaper than the scan.
+ */
+inline bool useWarpScan(const DeviceLaunchInfo& info, unsigned nNeurons, unsigned nTimesteps)
+{
+	return (nNeurons < info.nMultiprocessors * info.nLanes) && (nTimesteps > info.nLanes);
+}
+
+
 /** Forward pass for exponential leak
  *
  * v_t = alpha * v_{t-1} + I_t
- * Parallelize across neurons/batches
+ * Parallelize across neurons/batches, and also over time if there are few neurons
  */
 template <class scalarType>
 void leakyForwardCuda(
@@ -181,10 +372,27 @@ void leakyForwardCuda(
 	const scalarType* vmemInitial,
 	const scalarType* alpha,
 	unsigned nNeurons,
-	unsigned nTimesteps)
+	unsigned nTimesteps,
+	unsigned nInner)
 {
 
 	unsigned thread = 256;
+	DeviceLaunchInfo info = deviceLaunchInfo();
+
+	if(useWarpScan(info, nNeurons, nTimesteps))
+	{
+		// One warp per neuron
+		unsigned block = ceil(1.0f * info.nLanes * nNeurons / thread);
+
+		leakyForwardScanKernel<scalarType><<< block, thread >>>(
+				vmemAll,
+				input,
+				vmemInitial,
+				alpha,
+				nNeurons, nTimesteps, nInner);
+		return;
+	}
+
 	unsigned block  = ceil(1.0f * nNeurons / thread);
 
 	leakyForwardKernel<scalarType><<< block, thread >>>(
@@ -192,13 +400,13 @@ void leakyForwardCuda(
 			input,
 			vmemInitial,
 			alpha,
-			nNeurons, nTimesteps);
+			nNeurons, nTimesteps, nInner);
 }
 
 /** Backward pass for exponential leak
  *
  * v_t = alpha * v_{t-1} + I_t
- * Parallelize across neurons/batches
+ * Parallelize across neurons/batches, and also over time if there are few neurons
  */
 template <class scalarType>
 void leakyBackwardCuda(
@@ -206,17 +414,33 @@ void leakyBackwardCuda(
 	const scalarType* outputGrad,
 	const scalarType* alpha,
 	unsigned nNeurons,
-	unsigned nTimesteps)
+	unsigned nTimesteps,
+	unsigned nInner)
 {
 
 	unsigned thread = 256;
+	DeviceLaunchInfo info = deviceLaunchInfo();
+
+	if(useWarpScan(info, nNeurons, nTimesteps))
+	{
+		// One warp per neuron
+		unsigned block = ceil(1.0f * info.nLanes * nNeurons / thread);
+
+		leakyBackwardScanKernel<scalarType><<< block, thread >>>(
+				inputGrad,
+				outputGrad,
+				alpha,
+				nNeurons, nTimesteps, nInner);
+		return;
+	}
+
 	unsigned block  = ceil(1.0f * nNeurons / thread);
 
 	leakyBackwardKernel<scalarType><<< block, thread >>>(
 			inputGrad,
 			outputGrad,
 			alpha,
-			nNeurons, nTimesteps);
+			nNeurons, nTimesteps, nInner);
 }
 
 /** Backward pass for exponential leak to get alpha gradients
@@ -232,7 +456,8 @@ void leakyBackwardAlphaCuda(
 	const scalarType* vmemInitial,
 	const scalarType* alpha,
 	unsigned nNeurons,
-	unsigned nTimesteps)
+	unsigned nTimesteps,
+	unsigned nInner)
 {
 
 	unsigned thread = 256;
@@ -244,7 +469,7 @@ void leakyBackwardAlphaCuda(
 			output,
 			vmemInitial,
 			alpha,
-			nNeurons, nTimesteps);
+			nNeurons, nTimesteps, nInner);
 }
 
 
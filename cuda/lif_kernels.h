@@ -3,16 +3,134 @@
  * Contains routines to compute forward and backward passes
  * for the following neuron dynamics
  * - leaky and non-leaky integrate-and-fire
+ *
+ * Tensors that hold states over time can be 2D or 3D, as described in layout.h.
  */
 #ifndef LIFKERNELS_H_INCLUDED
 #define LIFKERNELS_H_INCLUDED
 
 #include <stdio.h>
+#include <climits>
+#include "layout.h"
+
+
+/** Spike generation mechanisms, resolved at compile time
+ *
+ * single: At most one spike per time step (SingleSpike)
+ * multi: Unbounded number of spikes per time step (MultiSpike)
+ * capped: At most maxNumSpikes spikes per time step (MaxSpike)
+ */
+enum class SpikeMode { single, multi, capped };
+
+
+/** Spike generation mechanism corresponding to a maximum number of spikes per time step
+ *
+ * @param maxNumSpikes Maximum number of spikes per time step. UINT_MAX (-1 as signed
+ *                     integer) for no limit.
+ */
+inline SpikeMode spikeModeFor(unsigned maxNumSpikes)
+{
+    if (maxNumSpikes == 1)          return SpikeMode::single;
+    if (maxNumSpikes == UINT_MAX)   return SpikeMode::multi;
+    return SpikeMode::capped;
+}
 
 
 // Kernel functions
 
 
+/** Number of spikes emitted at a given membrane potential
+ *
+ * Counting spikes with a floor division only gives 0 below threshold if vmem is
+ * not negative, hence the clamp, which does not require a branch.
+ *
+ * @param vmem Membrane potential (before reset)
+ * @param theta Firing threshold
+ * @param maxNumSpikes Maximum number of spikes. Only used in capped mode.
+ */
+template <SpikeMode spikeMode>
+__device__ __forceinline__ unsigned generateSpikes(
+    float vmem,
+    float theta,
+    unsigned maxNumSpikes)
+{
+    if (spikeMode == SpikeMode::single){
+        return vmem >= theta;
+    }
+    unsigned nSpikes = unsigned(fmaxf(vmem, 0.0f) / theta);
+    if (spikeMode == SpikeMode::capped){
+        nSpikes = min(nSpikes, maxNumSpikes);
+    }
+    return nSpikes;
+}
+
+
+/** Single time step of LIF or IAF dynamics
+ *
+ * Applies reset from previous spikes, decay, input, lower bound and spike generation
+ * to vmemCurr in place and returns the number of spikes for the current time step.
+ *
+ * @param vmemCurr Membrane potential after previous time step (before reset)
+ * @param activation Number of spikes emitted in previous time step
+ * @param input Input at current time step
+ * @param params Parameters of the current neuron, see PackedParams in layout.h
+ * See lifForwardKernel for the remaining parameters.
+ */
+template <bool normInput, SpikeMode spikeMode>
+__device__ __forceinline__ unsigned lifStep(
+    float& vmemCurr,
+    unsigned activation,
+    float input,
+    const float4& params,
+    float theta,
+    float thetaLow,
+    bool applyThetaLow,
+    unsigned maxNumSpikes)
+{
+    // Subtract spikes
+    vmemCurr -= activation * params.y;
+
+    // Decay state
+    vmemCurr *= params.x;
+
+    // Add current input to vmemCurr, optionally normalized by (1 - alpha)
+    if (normInput){
+    	vmemCurr += params.w * input;
+    } else {
+    	vmemCurr += input;
+    }
+
+    // Apply lower threshold
+    if (applyThetaLow && (vmemCurr < thetaLow)){
+    	vmemCurr = thetaLow;
+    }
+
+    // Generate spikes
+    return generateSpikes<spikeMode>(vmemCurr, theta, maxNumSpikes);
+}
+
+
+/** Add number of spikes of each thread to a global counter
+ *
+ * Counts are summed within each warp first, so that only one atomic operation per
+ * warp is needed. Has to be called by all threads of the warp.
+ *
+ * @param spikeCount Global counter
+ * @param nSpikes Number of spikes counted by current thread
+ */
+__device__ __forceinline__ void accumulateSpikeCount(
+    unsigned long long* spikeCount,
+    unsigned long long nSpikes)
+{
+    for(unsigned offset=warpSize/2; offset>0; offset >>= 1){
+        nSpikes += __shfl_down_sync(0xffffffff, nSpikes, offset);
+    }
+    if((threadIdx.x % warpSize == 0) && (nSpikes > 0)){
+        atomicAdd(spikeCount, nSpikes);
+    }
+}
+
+
 /** LIF or IAF forward kernel
  *
  * Forward evolution for a single IAF or LIF neuron, over time. Including state decay,
@@ -20,77 +138,196 @@
  * vmem_t = \alpha * (vmem_{t-1} - spikes_{t-1}) + input_t
  * spikes_t = (vmem_t // theta) * (vmem_t > 0)
  *
+ * If normInput is set, the input is scaled by (1 - \alpha) before it is added, i.e.
+ * vmem_t = \alpha * (vmem_{t-1} - spikes_{t-1}) + (1 - \alpha) * input_t
+ * This is resolved at compile time so that the inner loop does not branch.
+ * The same holds for the spike generation mechanism, spikeMode, which has to
+ * correspond to maxNumSpikes, see spikeModeFor.
+ *
+ * scalarType can be a reduced precision type (half or bfloat16), which halves the
+ * memory traffic. Per-neuron states are always float and the membrane potential is
+ * accumulated in float, only inputs and outputs are converted.
+ * spikeType is either the same as scalarType or uint8_t, if maxNumSpikes <= 255.
+ *
  * @param outputSpikes 2D-tensor (nNeurons x nTimesteps) to which the computed output spikes
  					   are to be written
  * @param vmemAll 2D-tensor (nNeurons x nTimesteps) to which the computed membrane
  *                potentials are to be written
+ * @param vmemLast 1D-tensor (nNeurons) to which the membrane potentials after the
+ *                 last time step, after reset, are to be written. Always float, such
+ *                 that states carried over to the next call are not rounded to
+ *                 scalarType. Can be nullptr if they are not needed.
  * @param input 2D-tensor (nNeurons x nTimesteps) with the input
- * @param vmemPostInitial 1D-tensor (nNeurons) with the initial membrane potentials (after reset)
- * @param alhpa 1D-tensor with decay factor of the neuron states (exp(-dt/tau)).
- *              For IAF neurons set to 1.
+ * @param params Packed per-neuron parameters, see PackedParams in layout.h:
+ *               the decay factor alpha of the neuron states (exp(-dt/tau)), 1 for
+ *               IAF neurons, and the value membrSubtract that is subtracted from
+ *               the membrane potential when spiking
+ * @param vmemPostInitial 1D-tensor (nNeurons) with the initial membrane potentials
+ *                        (after reset)
  * @param theta Firing threshold
- * @param membrSubtract 1D tensor with values that are subtracted from the membrane
- *        potential when spiking
  * @param thetaLow Lower bound to vmem
  * @param applyThetaLow Flag whether vmem is lower bounded
  * @param maxNumSpikes Maximum number of spikes a neuron can emit per time step
+ * @param spikeCount Counter to which the total number of spikes is added. Can be
+ *                   nullptr if spikes do not need to be counted.
  * @param nNeurons Number of neurons/batches
  * @param nTimesteps Number of timesteps
+ * @param nInner Number of neurons per batch (stride between time steps)
 **/
-template <class scalarType>
+template <class scalarType, class spikeType, bool normInput, SpikeMode spikeMode>
 __global__ void lifForwardKernel(
-    scalarType* __restrict__ outputSpikes,
+    spikeType* __restrict__ outputSpikes,
     scalarType* __restrict__ vmemAll,
+    float* __restrict__ vmemLast,
     const scalarType* __restrict__ input,
-    const scalarType* __restrict__ vmemPostInitial,
-    const scalarType* __restrict__ alpha,
-    const scalarType* __restrict__ membrSubtract,
+    const PackedParams params,
+    const float* __restrict__ vmemPostInitial,
     float theta,
     float thetaLow,
     bool applyThetaLow,
     unsigned maxNumSpikes,
+    unsigned long long* __restrict__ spikeCount,
     unsigned nNeurons,
-    unsigned nTimesteps)
+    unsigned nTimesteps,
+    unsigned nInner)
 {
     unsigned neuronID = blockIdx.x * blockDim.x + threadIdx.x;
     
-    if(neuronID >= nNeurons)	return;
-    
-    scalarType vmemCurr = vmemPostInitial[neuronID];
-    unsigned activation = 0;
+    unsigned long long nSpikes = 0;
+
+    if(neuronID < nNeurons){
+        // Index of first time step for current neuron
+        unsigned linearRowID = rowOffset(neuronID, nTimesteps, nInner);
+
+        // Single aligned load of all parameters
+        const float4 paramsN = params[neuronID];
+
+        float vmemCurr = vmemPostInitial[neuronID];
+        unsigned activation = 0;
     
-    for(unsigned t=0; t<nTimesteps; ++t){
-    	// Subtract spikes
-    	vmemCurr -= activation * membrSubtract[neuronID];
+        for(unsigned t=0; t<nTimesteps; ++t){
+        	// ID of neuron and current timestep
+        	unsigned linearID = linearRowID + t * nInner;
     
-    	// Decay state
-    	vmemCurr *= alpha[neuronID];
+        	activation = lifStep<normInput, spikeMode>(
+        		vmemCurr, activation, static_cast<float>(input[linearID]), paramsN,
+        		theta, thetaLow, applyThetaLow, maxNumSpikes);
     
-    	// ID of neuron and current timestep
-    	unsigned linearID = t + neuronID * nTimesteps;
+        	// Write activation into tensor
+        	outputSpikes[linearID] = static_cast<spikeType>(static_cast<float>(activation));
+        	nSpikes += activation;
     
-    	// Add current input to vmemCurr
-    	vmemCurr += input[linearID];
+        	// Write current vmemCurr into tensor
+        	vmemAll[linearID] = static_cast<scalarType>(vmemCurr);
+        }
+
+        if (vmemLast != nullptr){
+        	vmemLast[neuronID] = vmemCurr - activation * paramsN.y;
+        }
+    }
+
+    if(spikeCount != nullptr){
+        accumulateSpikeCount(spikeCount, nSpikes);
+    }
+
+}
+
+
+/** LIF or IAF forward kernel with synaptic dynamics
+ *
+ * Same as lifForwardKernel, but the input is first passed through an exponential
+ * synapse. The synaptic current is kept in a register, so that it does not have to
+ * be written to and read back from global memory between the two dynamics.
+ * iSyn_t = \alpha_{syn} * iSyn_{t-1} + input_t
+ * vmem_t = \alpha * (vmem_{t-1} - spikes_{t-1}) + iSyn_t
+ *
+ * If decayEarly is set, the input is scaled by \alpha_{syn} before it is added to
+ * the synaptic current.
+ *
+ * @param outputSpikes 2D-tensor (nNeurons x nTimesteps) to which the computed output spikes
+ 					   are to be written
+ * @param vmemAll 2D-tensor (nNeurons x nTimesteps) to which the computed membrane
+ *                potentials are to be written
+ * @param vmemLast 1D-tensor (nNeurons) to which the float membrane potentials after
+ *                 the last time step, after reset, are to be written. Can be nullptr.
+ * @param iSynAll 2D-tensor (nNeurons x nTimesteps) to which the computed synaptic
+ *                currents are to be written. Can be nullptr if they are not needed.
+ * @param iSynLast 1D-tensor (nNeurons) to which the synaptic currents at the last
+ *                 time step are to be written. Always float, like the neuron states.
+ * @param input 2D-tensor (nNeurons x nTimesteps) with the input
+ * @param params Packed per-neuron parameters as for lifForwardKernel, including
+ *               the decay factor alphaSyn of the synaptic currents
+ * @param iSynInitial 1D-tensor (nNeurons) with the initial synaptic currents
+ * @param decayEarly Flag whether input is scaled by alphaSyn
+ * See lifForwardKernel for the remaining parameters.
+**/
+template <class scalarType, class spikeType, bool normInput, SpikeMode spikeMode>
+__global__ void lifSynForwardKernel(
+    spikeType* __restrict__ outputSpikes,
+    scalarType* __restrict__ vmemAll,
+    float* __restrict__ vmemLast,
+    scalarType* __restrict__ iSynAll,
+    float* __restrict__ iSynLast,
+    const scalarType* __restrict__ input,
+    const PackedParams params,
+    const float* __restrict__ vmemPostInitial,
+    const float* __restrict__ iSynInitial,
+    float theta,
+    float thetaLow,
+    bool applyThetaLow,
+    unsigned maxNumSpikes,
+    bool decayEarly,
+    unsigned long long* __restrict__ spikeCount,
+    unsigned nNeurons,
+    unsigned nTimesteps,
+    unsigned nInner)
+{
+    unsigned neuronID = blockIdx.x * blockDim.x + threadIdx.x;
     
-    	// Apply lower threshold
-    	if (applyThetaLow && (vmemCurr < thetaLow)){
-    		vmemCurr = thetaLow;
-    	}
+    unsigned long long nSpikes = 0;
+
+    if(neuronID < nNeurons){
+        // Index of first time step for current neuron
+        unsigned linearRowID = rowOffset(neuronID, nTimesteps, nInner);
+
+        // Single aligned load of all parameters
+        const float4 paramsN = params[neuronID];
+        const float alphaSynN = paramsN.z;
+        const float inputScale = decayEarly ? alphaSynN : 1.0f;
+
+        float vmemCurr = vmemPostInitial[neuronID];
+        float iSynCurr = iSynInitial[neuronID];
+        unsigned activation = 0;
     
-    	// Generate spikes
-    	if(vmemCurr >= theta){
-    		activation = min(unsigned(vmemCurr / theta), maxNumSpikes);
-    	} else {
-    		activation = 0;
-    	}
+        for(unsigned t=0; t<nTimesteps; ++t){
+        	// ID of neuron and current timestep
+        	unsigned linearID = linearRowID + t * nInner;
+
+        	// Synaptic dynamics
+        	iSynCurr = alphaSynN * iSynCurr + inputScale * static_cast<float>(input[linearID]);
+        	if (iSynAll != nullptr){
+        		iSynAll[linearID] = static_cast<scalarType>(iSynCurr);
+        	}
     
-    	// Write activation into tensor
-    	outputSpikes[linearID] = static_cast<float>(activation);
+        	activation = lifStep<normInput, spikeMode>(
+        		vmemCurr, activation, iSynCurr, paramsN,
+        		theta, thetaLow, applyThetaLow, maxNumSpikes);
     
-    	// Write current vmemCurr into tensor
-    	vmemAll[linearID] = vmemCurr;
+        	// Write activation and vmemCurr into tensors
+        	outputSpikes[linearID] = static_cast<spikeType>(static_cast<float>(activation));
+        	nSpikes += activation;
+        	vmemAll[linearID] = static_cast<scalarType>(vmemCurr);
+        }
+
+        iSynLast[neuronID] = iSynCurr;
+        if (vmemLast != nullptr){
+        	vmemLast[neuronID] = vmemCurr - activation * paramsN.y;
+        }
     }
 
+    if(spikeCount != nullptr){
+        accumulateSpikeCount(spikeCount, nSpikes);
+    }
 }
 
 
@@ -111,41 +348,60 @@ __global__ void lifForwardKernel(
  * @param outputGrad 2D-tensor (nNeurons x nTimesteps) that holds the given output gradients
  * @param surr 2D-tensor (nNeurons x nTimesteps) with the given surrogate gradients
  *             ds_t/dV_t for each t
- * @param notClipped 2D-tensor (nNeurons x nTimesteps) indicating whether vmem has been clipped
- * @param alhpa 1D-tensor with decay factor of the neuron states (exp(-dt/tau)).
- *              For IAF neurons set to 1.
- * @param membrSubtract 1D-tensor of value that is subtracted from the membrane potential
- *        when spiking
- * @param nNeurons Number of neurons/batches
+ * @param notClipped 2D-tensor (nNeurons x nTimesteps) indicating whether vmem has been clipped.
+ *                   nullptr if vmem is not clipped.
+ * @param state 1D-array (nStateRows) of per-neuron parameters, each packed as
+ *              (alpha, membrSubtract). alpha is the decay factor of the neuron states
+ *              (exp(-dt/tau)), 1 for IAF neurons. membrSubtract is the value that is
+ *              subtracted from the membrane potential when spiking. Rows are repeated
+ *              along the neuron index, as for PackedParams in layout.h.
+ * @param nStateRows Number of rows of state, which divides nNeurons
+ * @param neuronOffset Index of the first neuron that is processed by this grid
+ * @param nNeurons Number of neurons/batches processed by this grid
  * @param nTimesteps Number of timesteps
+ * @param nInner Number of neurons per batch (stride between time steps)
+ *
+ * The template parameter neuronsAlongX determines whether neurons are distributed
+ * along the x- and time steps along the y-dimension of the grid or vice versa.
+ * Threads in a warp should access adjacent memory, so neurons go along x if
+ * nInner > 1 and time steps otherwise.
  */
-template <class scalarType>
+template <class scalarType, bool neuronsAlongX>
 __global__ void lifBackwardKernel(
     scalarType* __restrict__ inputGrad,
     const scalarType* __restrict__ outputGrad,
     const scalarType* __restrict__ surr,
     const scalarType* __restrict__ notClipped,
-    const scalarType* __restrict__ alpha,
-    const scalarType* __restrict__ membrSubtract,
+    const float2* __restrict__ state,
+    const unsigned nStateRows,
+    const unsigned neuronOffset,
     const unsigned nNeurons,
-    const unsigned nTimesteps)
+    const unsigned nTimesteps,
+    const unsigned nInner)
 {
+    unsigned x = blockIdx.x * blockDim.x + threadIdx.x;
+    unsigned y = blockIdx.y * blockDim.y + threadIdx.y;
+
     // Identifier corresponding to the element of the input gradient that is
     // computed as well as the denominator in the derivatives
-    unsigned i = blockIdx.x * blockDim.x + threadIdx.x;
+    unsigned i = neuronsAlongX ? y : x;
     if(i >= nTimesteps) return;
 
     // Identifier for the current neuron and/or batch
-    unsigned neuronID = blockIdx.y * blockDim.y + threadIdx.y;
-    if(neuronID >= nNeurons)    return;
+    unsigned localNeuronID = neuronsAlongX ? x : y;
+    if(localNeuronID >= nNeurons)    return;
+    unsigned neuronID = neuronOffset + localNeuronID;
 
-    // Index of first element in current row of 2D tensors (i.e. for current neuron)
-    unsigned linearRowID = neuronID * nTimesteps;
+    // Index of first time step for current neuron
+    unsigned linearRowID = rowOffset(neuronID, nTimesteps, nInner);
     // Index at which input-gradient is to be calculated
-    unsigned iIndex = i + linearRowID;
+    unsigned iIndex = linearRowID + i * nInner;
+
+    // Single aligned load of (alpha, membrSubtract)
+    const float2 neuronState = state[neuronID % nStateRows];
 
     // Accumulate product of past (alpha - surr * membrSubtract) * notClipped terms
-    float accGrad = notClipped[iIndex];
+    float accGrad = maskValue(notClipped, iIndex);
 
     // First summand of input gradient is surrogate gradient * output gradient * notClipped
     inputGrad[iIndex] = outputGrad[iIndex] * accGrad;
@@ -158,10 +414,10 @@ __global__ void lifBackwardKernel(
     for(unsigned j=i + 1; (j<nTimesteps and accGrad != 0.0f); ++j)
     {
         // ID for current surrogate gradient and output gradient
-        jIndex = j + linearRowID;
+        jIndex = linearRowID + j * nInner;
         // New factor to be accumulated
-        newFactor = alpha[neuronID] - membrSubtract[neuronID] * surr[jIndex - 1];
-        accGrad *= (newFactor * notClipped[jIndex]);
+        newFactor = neuronState.x - neuronState.y * surr[jIndex - nInner];
+        accGrad *= (newFactor * maskValue(notClipped, jIndex));
         // Add new term to current gradient
         inputGrad[iIndex] += accGrad * outputGrad[jIndex];
     }
@@ -169,87 +425,135 @@ __global__ void lifBackwardKernel(
 }
 
 
-/** LIF or IAF backward kernel for calculating alpha gradients
+/** LIF or IAF backward kernel for input and alpha gradients in a single reverse pass
  *
- * Assuming a function that calculates the output spikes of an IAF or LIF neuron (step-function
- * or exponential for input spike response and step-function for refractory response, arbitrary
- * surrogate gradients) for a given (synaptic) input, this kernel computes the alpha gradient
- * for one neuron and/or batch.
- * It amounts to the scalar product of the output gradient with the derivative of
- * the spike output wrt. alpha.
- * alphaGrad = \sum_{i=0}^{nTimesteps - 1} d(out_j) / d(alhpa) * outputGrad_j
- * \frac{d out_j}{d \alhpa} = accGrad_j * surr_j
- * accGrad_0 = 0,
- * accGrad_{j+1} = notClipped_{j+1} * (accGrad_j * (\alpha - surr_j * membrSubtract) + vmem_j)
- * @param alphaGrad 1D-tensor (nNeurons) to which the computed
- *                  alpha gradients are to be written
+ * Computes the same input gradients as lifBackwardKernel, but with one thread per
+ * neuron and/or batch that iterates backwards through time, using the recursion
+ *
+ * inputGrad_{nTimesteps-1} = outputGrad_{nTimesteps-1} * notClipped_{nTimesteps-1}
+ * inputGrad_i = notClipped_i * (outputGrad_i + (\alpha - surr_i * membrSubtract) * inputGrad_{i+1})
+ *
+ * If alphaGrad is not nullptr, the alpha gradient is accumulated in the same pass.
+ * With accGrad_j as defined in the forward recursion
+ * accGrad_0 = notClipped_0 * vmemPostInitial,
+ * accGrad_{j+1} = notClipped_{j+1} * (accGrad_j * (\alpha - surr_j * membrSubtract) + vmemPost_j),
+ * the alpha gradient is
+ * alphaGrad = \sum_{j=0}^{nTimesteps - 1} accGrad_j * outputGrad_j
+ *           = \sum_{j=0}^{nTimesteps - 1} inputGrad_j * vmemPost_{j-1},
+ * with vmemPost_{-1} = vmemPostInitial, because both recursions share the same
+ * factors. Surrogate and output gradients are therefore read only once.
+ *
+ * @param inputGrad 2D-tensor (nNeurons x nTimesteps) to which the computed
+ *                  input gradients are to be written
+ * @param alphaGrad 1D-tensor (nNeurons) to which the computed alpha gradients
+ *                  are to be written. Can be nullptr if not required.
  * @param outputGrad 2D-tensor (nNeurons x nTimesteps) that holds the given output gradients
  * @param surr 2D-tensor (nNeurons x nTimesteps) with the given surrogate gradients
- * @param vmemPost 2D-tensor (nNeurons x nTimesteps) with membrane potentials after reset
- * @param vmemPostInitial 1D-tensor (nNeurons) with initial membrane potentials (after reset)
  *             ds_t/dV_t for each t
- * @param notClipped 2D-tensor (nNeurons x nTimesteps) indicating whether vmem has been clipped
- * @param alhpa 1D-tensor with decay factor of the neuron states (exp(-dt/tau)).
- *              For IAF neurons set to 1.
- * @param membrSubtract 1D-tensor of value that is subtracted from the membrane potential
- *        when spiking
+ * @param notClipped 2D-tensor (nNeurons x nTimesteps) indicating whether vmem has been clipped.
+ *                   nullptr if vmem is not clipped.
+ * @param vmemPost 2D-tensor (nNeurons x nTimesteps) with membrane potentials after reset.
+ *                 Only read if alphaGrad is not nullptr.
+ * @param vmemPostInitial 1D-tensor (nNeurons) with initial membrane potentials (after reset).
+ *                        Only read if alphaGrad is not nullptr.
+ * @param state 1D-array (nStateRows) of per-neuron parameters, each packed as
+ *              (alpha, membrSubtract). alpha is the decay factor of the neuron states
+ *              (exp(-dt/tau)), 1 for IAF neurons. membrSubtract is the value that is
+ *              subtracted from the membrane potential when spiking. Rows are repeated
+ *              along the neuron index, as for PackedParams in layout.h.
+ * @param nStateRows Number of rows of state, which divides nNeurons
  * @param nNeurons Number of neurons/batches
  * @param nTimesteps Number of timesteps
+ * @param nInner Number of neurons per batch (stride between time steps)
  */
 template <class scalarType>
-__global__ void lifBackwardAlphaKernel(
+__global__ void lifBackwardScanKernel(
+    scalarType* __restrict__ inputGrad,
     scalarType* __restrict__ alphaGrad,
     const scalarType* __restrict__ outputGrad,
-    const scalarType* __restrict__ vmemPost,
-    const scalarType* __restrict__ vmemPostInitial,
     const scalarType* __restrict__ surr,
     const scalarType* __restrict__ notClipped,
-    const scalarType* __restrict__ alpha,
-    const scalarType* __restrict__ membrSubtract,
+    const scalarType* __restrict__ vmemPost,
+    const scalarType* __restrict__ vmemPostInitial,
+    const float2* __restrict__ state,
+    const unsigned nStateRows,
     const unsigned nNeurons,
-    const unsigned nTimesteps)
+    const unsigned nTimesteps,
+    const unsigned nInner)
 {
     // Identifier for the current neuron and/or batch
     unsigned neuronID = blockIdx.x * blockDim.x + threadIdx.x;
     if(neuronID >= nNeurons) return;
 
-    // Index of first element in current row of 2D tensors (i.e. for current neuron)
-    unsigned linearRowID = neuronID * nTimesteps;
+    // Index of first time step for current neuron
+    unsigned linearRowID = rowOffset(neuronID, nTimesteps, nInner);
 
-    // accGrad_{i+1} = alpha * (1 - membrSubtract * surr_{i}) * accGrad_i + vmemPost_i
-    float accGrad = vmemPostInitial[neuronID];
+    // Single aligned load of (alpha, membrSubtract)
+    const float2 neuronState = state[neuronID % nStateRows];
+    const float alphaN = neuronState.x;
+    const float membrSubtractN = neuronState.y;
+    bool getAlphaGrad = (alphaGrad != nullptr);
 
-    // Summand of input gradient is accGrad * surrogate gradient * output gradient * notClipped
-    float newGrad = notClipped[linearRowID] * accGrad;
-    alphaGrad[neuronID] = outputGrad[linearRowID] * newGrad;
+    // Input gradient of the following time step
+    float nextGrad = 0.0f;
+    float accAlphaGrad = 0.0f;
 
-    unsigned jIndex;
+    unsigned iIndex;
 
-    // Iterate through sum, over different derivative enumerators.
-    // Stop early when accumulated product is 0
-    for(unsigned j=1; j < nTimesteps; ++j)
+    for(int i=nTimesteps - 1; i >= 0; --i)
     {
-        // ID for current surrogate gradient and output gradient
-        jIndex = j + linearRowID;
-        // Multiply dv_t / dv_{t-1} - term to accumulated gradient
-        accGrad *= alpha[neuronID] * (1.0 - membrSubtract[neuronID] * surr[jIndex - 1]);
-        // Add membane potential
-        accGrad += vmemPost[jIndex - 1];
-        // Multiply with 0 if clipped
-        accGrad *= notClipped[jIndex];
-        // // New gradient for current time step
-        // newGrad = accGrad * surr[jIndex];
-        
-	// Add new term to current gradient scalar product
-        alphaGrad[neuronID] += accGrad * outputGrad[jIndex];
+        iIndex = linearRowID + i * nInner;
+        nextGrad = maskValue(notClipped, iIndex) * (
+            outputGrad[iIndex] + (alphaN - membrSubtractN * surr[iIndex]) * nextGrad
+        );
+        inputGrad[iIndex] = nextGrad;
+
+        if(getAlphaGrad)
+        {
+            // Membrane potential after reset at the previous time step
+            float vmemPrev = (i > 0) ? (float) vmemPost[iIndex - nInner] : (float) vmemPostInitial[neuronID];
+            accAlphaGrad += nextGrad * vmemPrev;
+        }
     }
 
+    if(getAlphaGrad) alphaGrad[neuronID] = accAlphaGrad;
 }
 
 
+
 // Host functions
 
 
+/** Specialization of lifForwardKernel for a given spike generation mechanism */
+template <class scalarType, class spikeType, bool normInput>
+auto lifForwardKernelFor(SpikeMode spikeMode)
+{
+	switch(spikeMode){
+		case SpikeMode::single:
+			return lifForwardKernel<scalarType, spikeType, normInput, SpikeMode::single>;
+		case SpikeMode::multi:
+			return lifForwardKernel<scalarType, spikeType, normInput, SpikeMode::multi>;
+		default:
+			return lifForwardKernel<scalarType, spikeType, normInput, SpikeMode::capped>;
+	}
+}
+
+
+/** Specialization of lifSynForwardKernel for a given spike generation mechanism */
+template <class scalarType, class spikeType, bool normInput>
+auto lifSynForwardKernelFor(SpikeMode spikeMode)
+{
+	switch(spikeMode){
+		case SpikeMode::single:
+			return lifSynForwardKernel<scalarType, spikeType, normInput, SpikeMode::single>;
+		case SpikeMode::multi:
+			return lifSynForwardKernel<scalarType, spikeType, normInput, SpikeMode::multi>;
+		default:
+			return lifSynForwardKernel<scalarType, spikeType, normInput, SpikeMode::capped>;
+	}
+}
+
+
 /** Forward pass for IAF or LIF neuron dynaimcs.
  *
  * Forward evolution for IAF or LIF neurons, including state decay, spike generation
@@ -262,64 +566,150 @@ __global__ void lifBackwardAlphaKernel(
  * Parallelize over neurons/batches
  *
  * @param outputSpikes 2D-tensor (nNeurons x nTimesteps) to which the computed output spikes
- 					   are to be written
+ 					   are to be written. Can be uint8, if maxNumSpikes <= 255.
  * @param vmem 2D-tensor (nNeurons x nTimesteps) to which the computed membrane potentials
  * 			   are to be written
+ * @param vmemLast 1D-tensor (nNeurons) to which the membrane potentials after the last
+ *                 time step, after reset, are to be written. nullptr if not required.
  * @param input 2D-tensor (nNeurons x nTimesteps) with the input
- * @param vmemPostInitial 1D-tensor (nNeurons) with the initial membrane potentials (after reset)
- * @param alhpa 1D-tensor with decay factor of the neuron states (exp(-dt/tau)).
- *              For IAF neurons set to 1.
- * @param membrSubtract 1D-tensor of value that is subtracted from the membrane potential
- *        when spiking
+ * @param params Packed per-neuron decay factors and membrane subtract values,
+ *               see PackedParams in layout.h
+ * @param vmemPostInitial 1D-tensor (nNeurons) with the initial membrane potentials
+ *                        (after reset)
  * @param theta Firing threshold
  * @param thetaLow Lower bound to vmem
  * @param applyThetaLow Flag whether vmem is lower bounded
- * @param multipleSpikes Flag whether multiple spikes can be emitted in a single time step
+ * @param maxNumSpikes Maximum number of spikes a neuron can emit per time step
+ * @param normInput Flag whether input is scaled by (1 - alpha)
+ * @param spikeCount Counter to which the total number of spikes is added. Can be
+ *                   nullptr if spikes do not need to be counted.
  * @param nNeurons Number of neurons/batches
  * @param nTimesteps Number of timesteps
+ * @param nInner Number of neurons per batch (stride between time steps)
  */
-template <class scalarType>
+template <class scalarType, class spikeType>
 void lifForwardCuda(
-	scalarType* outputSpikes,
+	spikeType* outputSpikes,
 	scalarType* vmem,
+	float* vmemLast,
 	const scalarType* input,
-	const scalarType* vmemPostInitial,
-	const scalarType* alpha,
-	const scalarType* membrSubtract,
+	const PackedParams params,
+	const float* vmemPostInitial,
 	const float theta,
 	const float thetaLow,
 	const bool applyThetaLow,
 	const unsigned maxNumSpikes,
+	const bool normInput,
+	unsigned long long* spikeCount,
 	const unsigned nNeurons,
-	const unsigned nTimesteps)
+	const unsigned nTimesteps,
+	const unsigned nInner)
 {
 
 	unsigned thread = 256;
 	unsigned block  = ceil(1.0f * nNeurons / thread);
 
-	lifForwardKernel<scalarType><<< block, thread >>>(
+	SpikeMode spikeMode = spikeModeFor(maxNumSpikes);
+	auto kernel = normInput ? lifForwardKernelFor<scalarType, spikeType, true>(spikeMode)
+	                        : lifForwardKernelFor<scalarType, spikeType, false>(spikeMode);
+
+	kernel<<< block, thread >>>(
 	    outputSpikes,
 	    vmem,
+	    vmemLast,
 	    input,
+	    params,
 	    vmemPostInitial,
-            alpha,
-	    membrSubtract,
-            theta,
-            thetaLow,
-            applyThetaLow,
-            maxNumSpikes,
-            nNeurons,
-            nTimesteps);
+	    theta,
+	    thetaLow,
+	    applyThetaLow,
+	    maxNumSpikes,
+	    spikeCount,
+	    nNeurons,
+	    nTimesteps,
+	    nInner);
+}
+
+
+/** Forward pass for IAF or LIF neuron dynamics with exponential synapses.
+ *
+ * Fused evolution of synaptic current and membrane potential, see
+ * lifSynForwardKernel. Parallelize over neurons/batches.
+ *
+ * @param iSynAll 2D-tensor (nNeurons x nTimesteps) to which the computed synaptic
+ *                currents are to be written. Can be nullptr if they are not needed.
+ * @param iSynLast 1D-tensor (nNeurons) to which the synaptic currents at the last
+ *                 time step are to be written
+ * @param params Packed per-neuron parameters, including the decay factors of the
+ *               synaptic currents
+ * @param iSynInitial 1D-tensor (nNeurons) with the initial synaptic currents
+ * @param decayEarly Flag whether input is scaled by alphaSyn
+ * See lifForwardCuda for the remaining parameters.
+ */
+template <class scalarType, class spikeType>
+void lifSynForwardCuda(
+	spikeType* outputSpikes,
+	scalarType* vmem,
+	float* vmemLast,
+	scalarType* iSynAll,
+	float* iSynLast,
+	const scalarType* input,
+	const PackedParams params,
+	const float* vmemPostInitial,
+	const float* iSynInitial,
+	const float theta,
+	const float thetaLow,
+	const bool applyThetaLow,
+	const unsigned maxNumSpikes,
+	const bool normInput,
+	const bool decayEarly,
+	unsigned long long* spikeCount,
+	const unsigned nNeurons,
+	const unsigned nTimesteps,
+	const unsigned nInner)
+{
+
+	unsigned thread = 256;
+	unsigned block  = ceil(1.0f * nNeurons / thread);
+
+	SpikeMode spikeMode = spikeModeFor(maxNumSpikes);
+	auto kernel = normInput ? lifSynForwardKernelFor<scalarType, spikeType, true>(spikeMode)
+	                        : lifSynForwardKernelFor<scalarType, spikeType, false>(spikeMode);
+
+	kernel<<< block, thread >>>(
+	    outputSpikes,
+	    vmem,
+	    vmemLast,
+	    iSynAll,
+	    iSynLast,
+	    input,
+	    params,
+	    vmemPostInitial,
+	    iSynInitial,
+	    theta,
+	    thetaLow,
+	    applyThetaLow,
+	    maxNumSpikes,
+	    decayEarly,
+	    spikeCount,
+	    nNeurons,
+	    nTimesteps,
+	    nInner);
 }
 
 
 /** Backward pass for IAF or LIF neuron dynaimcs.
  * 
  * Corresponding backward function for lifForward. Will backpropagate a gradient wrt. outputSpikes
- * to a gradient wrt. input. Works for arbitrary choices of surrogate gradients.
+ * to a gradient wrt. input and, optionally, wrt. alpha. Works for arbitrary choices of
+ * surrogate gradients.
  *
- * Parallelize over neurons/batches (thread.y) and elements of the input gradient (thread.x)
- * by using lifBackwardKernel.
+ * If alpha gradients are requested, both gradients are computed in a single reverse
+ * pass over time by lifBackwardScanKernel, parallelized over neurons/batches only.
+ * Otherwise parallelize over neurons/batches and elements of the input gradient by using
+ * lifBackwardKernel. For 2D tensors neurons are distributed along thread.y and time
+ * steps along thread.x, for 3D tensors the other way round, such that memory access
+ * within a warp is coalesced.
  *
  * The call to lifBackwardKernel can be replaced with spikeBackwardKernel, which will
  * give the derivatives wrt. to the synaptic inputs after they have been convolved with
@@ -331,31 +721,90 @@ void lifForwardCuda(
  *
  * @param inputGrad 2D-tensor (nNeurons x nTimesteps) to which the computed
  *                  input gradients are to be written
+ * @param alphaGrad 1D-tensor (nNeurons) to which the computed alpha gradients
+ *                  are to be written. nullptr if not required.
  * @param outputGrad 2D-tensor (nNeurons x nTimesteps) that holds the given output gradients
  * @param surr 2D-tensor (nNeurons x nTimesteps) with the given surrogate gradients ds_t/dV_t for each t
  * @param notClipped 2D-tensor (nNeurons x nTimesteps) indicating for each time step whether the
  *                   membrane potential has been clipped to a constant, which will
- *                   result in 0 gradients at this point.
- * @param alhpa 1D-tensor with decay factor of the neuron states (exp(-dt/tau)).
- *              For IAF neurons set to 1.
- * @param membrSubtract 1D-tensor of value that is subtracted from the membrane potential
- *        when spiking
+ *                   result in 0 gradients at this point. nullptr if there is no lower bound.
+ * @param vmemPost 2D-tensor (nNeurons x nTimesteps) with membrane potentials after reset.
+ *                 Only required for alpha gradients.
+ * @param vmemPostInitial 1D-tensor (nNeurons) with initial membrane potentials (after reset).
+ *                        Only required for alpha gradients.
+ * @param state 1D-array (nStateRows) of per-neuron parameters, each packed as
+ *              (alpha, membrSubtract). alpha is the decay factor of the neuron states
+ *              (exp(-dt/tau)), 1 for IAF neurons. membrSubtract is the value that is
+ *              subtracted from the membrane potential when spiking. Rows are repeated
+ *              along the neuron index, as for PackedParams in layout.h.
+ * @param nStateRows Number of rows of state, which divides nNeurons
  * @param nNeurons Number of neurons/batches
  * @param nTimesteps Number of timesteps
+ * @param nInner Number of neurons per batch (stride between time steps)
  */
 template <class scalarType>
 void lifBackwardCuda(
     scalarType* inputGrad,
+    scalarType* alphaGrad,
     const scalarType* outputGrad,
     const scalarType* surr,
     const scalarType* notClipped,
-    const scalarType* alpha,
-    const scalarType* membrSubtract,
+    const scalarType* vmemPost,
+    const scalarType* vmemPostInitial,
+    const float2* state,
+    const unsigned nStateRows,
     const unsigned nNeurons,
-    const unsigned nTimesteps)
+    const unsigned nTimesteps,
+    const unsigned nInner)
 {
+    if(alphaGrad != nullptr)
+    {
+        unsigned thread = 256;
+        unsigned block  = ceil(1.0f * nNeurons / thread);
+
+        lifBackwardScanKernel<scalarType><<< block, thread >>>(
+            inputGrad,
+            alphaGrad,
+            outputGrad,
+            surr,
+            notClipped,
+            vmemPost,
+            vmemPostInitial,
+            state,
+            nStateRows,
+            nNeurons,
+            nTimesteps,
+            nInner);
+
+        return;
+    }
+
     dim3 thread(128, 8, 1);
 
+    if(nInner > 1)
+    {
+        // Neurons along x, time steps along y
+        dim3 block( ceil( 1.0f * nNeurons   / thread.x ),
+                    ceil( 1.0f * nTimesteps / thread.y ),
+                    1 );
+
+        if(block.y >= 65535)    AT_ERROR("maximum blockDim.y exceeded.");
+
+        lifBackwardKernel<scalarType, true><<< block, thread >>>(
+            inputGrad,
+            outputGrad,
+            surr,
+            notClipped,
+            state,
+            nStateRows,
+            0,
+            nNeurons,
+            nTimesteps,
+            nInner);
+
+        return;
+    }
+
     int nGrid = ceil(1.0f * nNeurons / thread.y / 65535);
     int neuronsPerGrid = ceil(1.0f * nNeurons / nGrid);
 
@@ -374,72 +823,18 @@ void lifBackwardCuda(
         if(block.y >= 65535)    AT_ERROR("maximum blockDim.y exceeded.");
         if(block.z >= 65535)    AT_ERROR("maximum blockDim.z exceeded.");
 
-        lifBackwardKernel<scalarType><<< block, thread >>>(
-            inputGrad + startOffset * nTimesteps,
-            outputGrad  + startOffset * nTimesteps,
-            surr + startOffset * nTimesteps,
-            notClipped + startOffset * nTimesteps,
-            alpha + startOffset,
-            membrSubtract + startOffset,
-            neuronsInGrid,
-            nTimesteps);
-    }
-}
-
-
-/** Backward pass for IAF or LIF neuron dynaimcs to calculate alpha gradients.
- *
- * Corresponding backward function for alpha gradients of lifForward. Will backpropagate
- * a gradient wrt. outputSpikes to a gradient wrt. alpha. Works for arbitrary choices of
- * surrogate gradients.
- *
- * Parallelize over neurons/batches by using lifBackwardAlphaKernel.
- *
- * @param alphaGrad 2D-tensor (nNeurons x nTimesteps) to which the computed
- *                  alpha gradients are to be written
- * @param outputGrad 2D-tensor (nNeurons x nTimesteps) that holds the given output gradients
- * @param vmemPost 2D-tensor (nNeurons x nTimesteps) with membrane potentials after reset
- * @param vmemPostInitial 1D-tensor (nNeurons) with initial membrane potentials (after reset)
- * @param surr 2D-tensor (nNeurons x nTimesteps) with the given surrogate gradients ds_t/dV_t for each t
- * @param notClipped 2D-tensor (nNeurons x nTimesteps) indicating for each time step whether the
- *                   membrane potential has been clipped to a constant, which will
- *                   result in 0 gradients at this point.
- * @param alhpa 1D-tensor with decay factor of the neuron states (exp(-dt/tau)).
- *              For IAF neurons set to 1.
- * @param membrSubtract 1D-tensor of value that is subtracted from the membrane potential
- *        when spiking
- * @param nNeurons Number of neurons/batches
- * @param nTimesteps Number of timesteps
- */
-template <class scalarType>
-void lifBackwardAlphaCuda(
-    scalarType* alphaGrad,
-    const scalarType* outputGrad,
-    const scalarType* vmemPost,
-    const scalarType* vmemPostInitial,
-    const scalarType* surr,
-    const scalarType* notClipped,
-    const scalarType* alpha,
-    const scalarType* membrSubtract,
-    const unsigned nNeurons,
-    const unsigned nTimesteps)
-{
-
-
-    unsigned thread = 256;
-    unsigned block  = ceil(1.0f * nNeurons / thread);
-
-    lifBackwardAlphaKernel<scalarType><<< block, thread >>>(
-            alphaGrad,
+        lifBackwardKernel<scalarType, false><<< block, thread >>>(
+            inputGrad,
             outputGrad,
-	    vmemPost,
-            vmemPostInitial,
             surr,
             notClipped,
-            alpha,
-            membrSubtract,
-            nNeurons,
-            nTimesteps);
+            state,
+            nStateRows,
+            startOffset,
+            neuronsInGrid,
+            nTimesteps,
+            nInner);
+    }
 }
 
 
@@ -46,7 +46,7 @@ version_major = version.split(".")[0]
 setup(
     name='sinabs-exodus',
     version=version,
-    packages=['sinabs.exodus', 'sinabs.exodus.layers'],
+    packages=['sinabs.exodus', 'sinabs.exodus.layers', 'sinabs.exodus.cpu'],
     ext_modules=[
         CUDAExtension(
             name='exodus_cuda',
@@ -56,13 +56,15 @@ setup(
                 # 'cuda/experimental_bindings.cu',
             ],
             depends=[
-                'cuda/lif_kernels.h'
-                'cuda/leaky_kernels.h'
+                'cuda/layout.h',
+                'cuda/lif_kernels.h',
+                'cuda/leaky_kernels.h',
                 # 'cuda/experimental_kernels.h'
             ],
         )
     ],
     cmdclass=cmdclass,
     install_requires=["torch", f"sinabs == {version_major}.*, >= 1.1.1"],
+    extras_require={"cpu": ["numba"]},
 )
 
@@ -12,6 +12,18 @@ module_map = {
     sl.ExpLeakSqueeze: el.ExpLeakSqueeze,
 }
 
+# Constructor arguments of EXODUS layers that Sinabs layers do not take
+_exodus_only_args = ("decay_early", "compute_dtype", "use_cuda_graphs", "compile_epilogue")
+
+
+def _sinabs_arg_dict(module: torch.nn.Module) -> dict:
+    """Constructor arguments of an EXODUS layer, without those specific to EXODUS"""
+    return {
+        name: value
+        for name, value in module.arg_dict.items()
+        if name not in _exodus_only_args
+    }
+
 
 def exodus_to_sinabs(model: torch.nn.Module):
     """
@@ -27,7 +39,9 @@ def exodus_to_sinabs(model: torch.nn.Module):
     mapping_list = [
         (
             exodus_class,
-            lambda module, replacement=sinabs_class: replacement(**module.arg_dict),
+            lambda module, replacement=sinabs_class: replacement(
+                **_sinabs_arg_dict(module)
+            ),
         )
         for sinabs_class, exodus_class in module_map.items()
     ]
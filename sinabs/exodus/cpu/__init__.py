@@ -0,0 +1,3 @@
+"""
+CPU fallback for EXODUS kernels, compiled with numba
+"""
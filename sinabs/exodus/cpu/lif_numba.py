@@ -0,0 +1,215 @@
+"""
+CPU implementations of the LIF forward and backward passes, compiled with numba.
+
+Functions mirror `lif_forward` and `lif_backward` in `sinabs.exodus.ops` and
+operate on the same tensor layouts. Neurons are distributed over threads and
+time steps are iterated serially, as in the CUDA kernels. Compiled kernels are
+cached by numba, per signature.
+"""
+
+from typing import Optional, Tuple
+
+import numpy as np
+import torch
+from numba import njit, prange
+
+
+# Data types that kernels read and write directly. Others are converted.
+_NUMPY_DTYPES = (torch.float32, torch.float64, torch.uint8)
+
+
+def _as_3d(x: torch.Tensor) -> torch.Tensor:
+    """View 2D (N, T_sim) tensor as (N, T_sim, 1), leave 3D tensors unchanged"""
+    return x.unsqueeze(-1) if x.ndim == 2 else x
+
+
+def _readable(x: torch.Tensor) -> np.ndarray:
+    """3D numpy view of `x`, converted to float32 if necessary"""
+    if x.dtype not in _NUMPY_DTYPES:
+        x = x.float()
+    return _as_3d(x.detach()).numpy()
+
+
+def _writable(x: torch.Tensor) -> Tuple[np.ndarray, Optional[torch.Tensor]]:
+    """
+    3D numpy array that a kernel can write results for `x` to. If `x` cannot be
+    written directly, the float32 tensor that results need to be copied from is
+    returned as well.
+    """
+    if x.dtype in _NUMPY_DTYPES:
+        return _as_3d(x.detach()).numpy(), None
+    buffer = torch.empty_like(x, dtype=torch.float32)
+    return _as_3d(buffer).numpy(), buffer
+
+
+@njit(parallel=True, fastmath=True, cache=True)
+def _lif_forward_kernel(
+    output_spikes,
+    v_mem,
+    v_mem_last,
+    inp,
+    params,
+    v_mem_init,
+    threshold,
+    min_v_mem,
+    apply_min_v_mem,
+    max_num_spikes_per_bin,
+    norm_input,
+):
+    n_batches, n_timesteps, n_inner = inp.shape
+    n_rows = params.shape[0]
+    n_spikes = np.zeros(n_batches * n_inner, dtype=np.int64)
+
+    for neuron in prange(n_batches * n_inner):
+        batch = neuron // n_inner
+        inner = neuron % n_inner
+
+        # Rows of packed parameters repeat along the neuron index
+        row = neuron % n_rows
+        alpha_n = params[row, 0]
+        membrane_subtract_n = params[row, 1]
+        input_scale = params[row, 3] if norm_input else 1.0
+        v_mem_curr = v_mem_init[neuron]
+        activation = 0
+
+        for t in range(n_timesteps):
+            # Subtract spikes, decay state and add input
+            v_mem_curr = alpha_n * (v_mem_curr - activation * membrane_subtract_n)
+            v_mem_curr += input_scale * inp[batch, t, inner]
+
+            if apply_min_v_mem and v_mem_curr < min_v_mem:
+                v_mem_curr = min_v_mem
+
+            # Generate spikes
+            if v_mem_curr >= threshold:
+                activation = int(v_mem_curr / threshold)
+                if max_num_spikes_per_bin >= 0:
+                    activation = min(activation, max_num_spikes_per_bin)
+            else:
+                activation = 0
+
+            output_spikes[batch, t, inner] = activation
+            v_mem[batch, t, inner] = v_mem_curr
+            n_spikes[neuron] += activation
+
+        if v_mem_last is not None:
+            v_mem_last[neuron] = v_mem_curr - activation * membrane_subtract_n
+
+    return n_spikes.sum()
+
+
+@njit(parallel=True, fastmath=True, cache=True)
+def _lif_backward_kernel(
+    grad_input,
+    grad_alpha,
+    grad_output,
+    surrogates,
+    not_clipped,
+    v_mem_post,
+    v_mem_init,
+    state,
+):
+    n_batches, n_timesteps, n_inner = surrogates.shape
+    n_rows = state.shape[0]
+
+    for neuron in prange(n_batches * n_inner):
+        batch = neuron // n_inner
+        inner = neuron % n_inner
+
+        alpha = state[neuron % n_rows, 0]
+        membrane_subtract = state[neuron % n_rows, 1]
+
+        # Same reverse recursion as lifBackwardScanKernel
+        next_grad = 0.0
+        acc_alpha_grad = 0.0
+
+        for t in range(n_timesteps - 1, -1, -1):
+            factor = alpha - membrane_subtract * surrogates[batch, t, inner]
+            next_grad = grad_output[batch, t, inner] + factor * next_grad
+            if not_clipped is not None:
+                next_grad *= not_clipped[batch, t, inner]
+            grad_input[batch, t, inner] = next_grad
+
+            if grad_alpha is not None:
+                if t > 0:
+                    acc_alpha_grad += next_grad * v_mem_post[batch, t - 1, inner]
+                else:
+                    acc_alpha_grad += next_grad * v_mem_init[neuron]
+
+        if grad_alpha is not None:
+            grad_alpha[neuron] = acc_alpha_grad
+
+
+def lif_forward(
+    output_spikes: torch.Tensor,
+    v_mem: torch.Tensor,
+    v_mem_last: Optional[torch.Tensor],
+    inp: torch.Tensor,
+    params: torch.Tensor,
+    v_mem_init: torch.Tensor,
+    threshold: float,
+    min_v_mem: float,
+    apply_min_v_mem: bool,
+    max_num_spikes_per_bin: int,
+    norm_input: bool,
+    spike_count: Optional[torch.Tensor] = None,
+) -> None:
+    """
+    CPU version of `exodus_cuda.lifForward`. Writes to `output_spikes` and `v_mem`,
+    and to `v_mem_last`, if provided.
+    """
+    output_np, output_buffer = _writable(output_spikes)
+    v_mem_np, v_mem_buffer = _writable(v_mem)
+
+    n_spikes = _lif_forward_kernel(
+        output_np,
+        v_mem_np,
+        None if v_mem_last is None else v_mem_last.detach().numpy(),
+        _readable(inp),
+        params.detach().numpy(),
+        v_mem_init.detach().numpy(),
+        threshold,
+        min_v_mem,
+        apply_min_v_mem,
+        max_num_spikes_per_bin,
+        norm_input,
+    )
+
+    if output_buffer is not None:
+        output_spikes.copy_(output_buffer)
+    if v_mem_buffer is not None:
+        v_mem.copy_(v_mem_buffer)
+    if spike_count is not None:
+        spike_count += n_spikes
+
+
+def lif_backward(
+    surrogates: torch.Tensor,
+    grad_output: torch.Tensor,
+    not_clipped: Optional[torch.Tensor],
+    state: torch.Tensor,
+    grad_alpha: Optional[torch.Tensor] = None,
+    v_mem_post: Optional[torch.Tensor] = None,
+    v_mem_init: Optional[torch.Tensor] = None,
+) -> torch.Tensor:
+    """
+    CPU version of `exodus_cuda.lifBackward`. Returns input gradients and writes
+    alpha gradients to `grad_alpha`, if provided.
+    """
+    if grad_alpha is not None and (v_mem_post is None or v_mem_init is None):
+        raise ValueError("`v_mem_post` and `v_mem_init` are required for alpha gradients")
+
+    grad_input = torch.empty_like(surrogates)
+
+    _lif_backward_kernel(
+        _as_3d(grad_input).numpy(),
+        None if grad_alpha is None else grad_alpha.detach().numpy(),
+        _readable(grad_output),
+        _readable(surrogates),
+        None if not_clipped is None else _readable(not_clipped),
+        None if grad_alpha is None else _readable(v_mem_post),
+        None if grad_alpha is None else v_mem_init.detach().numpy(),
+        state.detach().numpy(),
+    )
+
+    return grad_input
@@ -69,6 +69,9 @@ class ExpLeak(LIF):
         param_dict.pop("reset_fn")
         param_dict.pop("surrogate_grad_fn")
         param_dict.pop("spike_threshold")
+        param_dict.pop("compute_dtype")
+        param_dict.pop("use_cuda_graphs")
+        param_dict.pop("compile_epilogue")
         return param_dict
 
 
@@ -50,6 +50,17 @@ class IAF(LIF):
         time step, i.e. an input pulse of 1 will result in a synaptic current of
         alpha, rather than one. This only holds for synaptic currents. This is the
         same behavior as in sinabs. Default: True.
+    compute_dtype: torch.dtype or None
+        If set to torch.float16 or torch.bfloat16, inputs are converted to this
+        type before dynamics are evolved, which reduces memory traffic. Neuron
+        states are still accumulated in float32, see `LIF`. Default: None (use type of the input).
+    use_cuda_graphs: bool
+        When True, forward passes on CUDA without autograd and without
+        `record_states` are captured into a CUDA graph and replayed. See
+        `LIF`. Default: False.
+    compile_epilogue: bool
+        When True, operations following the neuron dynamics are compiled with
+        `torch.compile` into a single fused kernel. See `LIF`. Default: False.
     """
 
     def __init__(
@@ -63,6 +74,9 @@ class IAF(LIF):
         shape: Optional[torch.Size] = None,
         record_states: bool = False,
         decay_early: bool = True,
+        compute_dtype: Optional[torch.dtype] = None,
+        use_cuda_graphs: bool = False,
+        compile_epilogue: bool = False,
     ):
         super().__init__(
             tau_mem=np.inf,
@@ -76,13 +90,17 @@ class IAF(LIF):
             norm_input=False,
             record_states=record_states,
             decay_early=decay_early,
+            compute_dtype=compute_dtype,
+            use_cuda_graphs=use_cuda_graphs,
+            compile_epilogue=compile_epilogue,
         )
         # IAF does not have time constants
         self.tau_mem = None
 
     @property
     def alpha_mem_calculated(self):
-        return torch.tensor(1.).to(self.v_mem.device)
+        # Created on the device directly, which can be captured in CUDA graphs
+        return torch.ones((), device=self.v_mem.device)
 
     @property
     def _param_dict(self) -> dict:
@@ -1,3 +1,5 @@
+import functools
+import math
 from typing import Callable, Optional, Union
 
 import torch
@@ -12,11 +14,96 @@ from sinabs.activation import (
 )
 
 from sinabs.exodus.leaky import LeakyIntegrator
-from sinabs.exodus.spike import IntegrateAndFire
+from sinabs.exodus.spike import (
+    IntegrateAndFire,
+    SynapticIntegrateAndFire,
+    _pack_params,
+    _spike_dtype,
+)
+from sinabs.exodus.utils import neuron_view
 
 __all__ = ["LIF", "LIFSqueeze"]
 
 
+def _pack_outputs(
+    output_3d: torch.Tensor,
+    v_mem_3d: torch.Tensor,
+    spike_count: Optional[torch.Tensor],
+    membrane_subtract: Optional[float],
+    original_shape: tuple,
+    output_dtype: torch.dtype,
+    state_dtype: torch.dtype,
+    v_mem_last: Optional[torch.Tensor] = None,
+):
+    """
+    Bring outputs of the neuron dynamics to the shape of the layer input and
+    derive new neuron states and firing rate from them.
+
+    Parameters
+    ----------
+    output_3d: torch.Tensor
+        Output of the dynamics, shape (batch_size, time_steps, N)
+    v_mem_3d: torch.Tensor
+        Membrane potentials, same shape as `output_3d`
+    spike_count: torch.Tensor or None
+        Total number of output spikes if counted in the kernel. If None, it
+        is computed from `output_3d`.
+    membrane_subtract: float or None
+        Value to subtract from the last membrane potentials per output spike.
+        None if no reset needs to be applied.
+    original_shape: tuple of int
+        Shape of the layer input
+    output_dtype: torch.dtype
+        Type of returned output and firing rate
+    state_dtype: torch.dtype
+        Type of returned membrane potentials
+    v_mem_last: torch.Tensor or None
+        float32 membrane potentials after the last time step and reset, if
+        computed by the kernel, shape (N,). If None, they are derived from
+        `v_mem_3d`, which may be of reduced precision.
+
+    Returns
+    -------
+    torch.Tensor
+        Output, shape `original_shape`
+    torch.Tensor
+        Membrane potentials after last time step, shape (batch_size, *trailing_dim)
+    torch.Tensor
+        Firing rate
+    """
+    output_full = output_3d.reshape(original_shape)
+
+    if v_mem_last is not None:
+        v_mem_last = v_mem_last.reshape(original_shape[:1] + original_shape[2:])
+    elif membrane_subtract is None:
+        v_mem_last = v_mem_3d.reshape(original_shape)[:, -1].clone()
+    else:
+        v_mem_last = v_mem_3d.reshape(original_shape)[:, -1]
+        # Only the membrane potential after the last time step is kept,
+        # so the reset does not need to be applied to all time steps
+        v_mem_last = v_mem_last - membrane_subtract * output_full[:, -1]
+
+    if spike_count is None:
+        # Count in float32, which is exact for far more spikes than float16
+        # or bfloat16. The rate is only converted to `output_dtype` at the end.
+        num_spikes = output_full.sum(dtype=torch.float32)
+    else:
+        # Exact int64 count from the kernel
+        num_spikes = spike_count.double()
+    firing_rate = (num_spikes / output_full.numel()).to(output_dtype)
+
+    # Spikes may be stored in reduced precision or as uint8, in which case
+    # counts are exact. Convert back to input dtype for next layer.
+    # Neuron states are kept in their own dtype.
+    return output_full.to(output_dtype), v_mem_last.to(state_dtype), firing_rate
+
+
+@functools.lru_cache(maxsize=None)
+def _compiled_pack_outputs() -> Callable:
+    """`_pack_outputs` compiled with TorchInductor, created on first use"""
+    return torch.compile(_pack_outputs, fullgraph=True, dynamic=True)
+
+
 class LIF(LIFSinabs):
     """
     Exodus implementation of a Leaky Integrate and Fire neuron layer.
@@ -52,6 +139,10 @@ class LIF(LIFSinabs):
         Lower bound for membrane potential v_mem, clipped at every time step.
     train_alphas: bool
         When True, the discrete decay factor exp(-1/tau) is used for training rather than tau itself.
+        The range of the resulting alphas is only checked again after the time
+        constants have been replaced or modified in place, e.g. by an optimizer.
+        Edits through `.data`, such as `tau_mem.data.copy_(...)`, bypass this
+        detection. Modify the parameters inside `torch.no_grad()` instead.
     shape: torch.Size
         Optionally initialise the layer state with given shape. If None, will be inferred from input_size.
     norm_input: bool
@@ -64,6 +155,29 @@ class LIF(LIFSinabs):
         alpha, rather than one. This only holds for synaptic currents. Membrane
         potential will be decayed only in next time step, irrespective of how
         `decay_early` is set. This is the same behavior as in sinabs. Default: True.
+    compute_dtype: torch.dtype or None
+        If set to torch.float16 or torch.bfloat16, inputs are converted to this
+        type before spiking dynamics are evolved, which reduces memory traffic.
+        Neuron states are still accumulated in float32 and outputs are converted
+        back to the type of the input. Without autograd, states are also carried
+        over to the next forward pass in float32. With autograd, the new membrane
+        potential is derived from the recorded ones, so it is rounded to
+        `compute_dtype`. Intended for inference. Has no effect on non-spiking
+        layers. Default: None (use type of the input).
+    use_cuda_graphs: bool
+        When True, forward passes on CUDA without autograd and without
+        `record_states` are captured into a CUDA graph on the second call with a
+        given input shape and replayed afterwards. This removes most of the host
+        overhead of launching individual kernels, which dominates for short
+        inputs or small batches. Inputs, outputs and states are copied to and
+        from static buffers at each call. Only the graph for the most recent
+        input shape and configuration is kept, `release_workspaces` frees it.
+        Default: False.
+    compile_epilogue: bool
+        When True, the reshapes, reset of the last membrane potential and
+        firing rate computation that follow the neuron dynamics are compiled
+        with `torch.compile` into a single fused kernel. Compilation happens
+        at the first forward pass and requires torch 2.0 or later. Default: False.
     """
 
     def __init__(
@@ -80,7 +194,13 @@ class LIF(LIFSinabs):
         norm_input: bool = True,
         record_states: bool = False,
         decay_early: bool = True,
+        compute_dtype: Optional[torch.dtype] = None,
+        use_cuda_graphs: bool = False,
+        compile_epilogue: bool = False,
     ):
+        if compile_epilogue and not hasattr(torch, "compile"):
+            raise ValueError("`compile_epilogue` requires torch 2.0 or later.")
+
         # Make sure activation functions match exodus specifications
         self._parse_activation_fn(spike_fn, reset_fn)
 
@@ -99,6 +219,27 @@ class LIF(LIFSinabs):
         )
 
         self.decay_early = decay_early
+        self.compute_dtype = compute_dtype
+        # Identifies time constants for which alphas have been validated last
+        self._validated_alpha_key = None
+        # Per-neuron parameters packed for the spiking dynamics, and the
+        # parameters they have been packed from, see `_update_state_pack`
+        self._state_pack = None
+        self._state_pack_key = None
+        self.use_cuda_graphs = use_cuda_graphs
+        self.compile_epilogue = compile_epilogue
+        # Captured forward pass, keyed by `_graph_key`. None for a configuration
+        # that has been seen only once so far. Only the most recent configuration
+        # is kept.
+        self._graph_cache = dict()
+        self._graph_pool = None
+        # Flat buffers that kernel outputs are written to, where possible, see
+        # `_dynamics_workspaces`. They grow to the largest size needed so far.
+        self._ws_vmem = None
+        self._ws_spk = None
+        # Input shape of the last forward pass, with the corresponding state shape
+        # and 3D kernel shape, see `_prepare_input`
+        self._cached_shape = None
 
     def _parse_activation_fn(self, spike_fn, reset_fn):
 
@@ -125,7 +266,7 @@ class LIF(LIFSinabs):
     def _prepare_input(self, input_data: torch.Tensor):
         """
         Make sure neuron states are initialized in correct shape.
-        Reshape input to 2D
+        Reshape input to 3D
 
         Parameters
         ----------
@@ -135,87 +276,346 @@ class LIF(LIFSinabs):
         Returns
         -------
         torch.tensor
-            Input, reshaped to (N, time_steps), where N is the product of
-            batch_size and all trailing dimensions.
-        tuple of int
+            Input, reshaped to (batch_size, time_steps, N), where N is the
+            product of all trailing dimensions. This is a view of `input_data`
+            if it is contiguous.
+        torch.Size
             Original shape of input
         """
 
-        batch_size, time_steps, *trailing_dim = input_data.shape
+        # Derived shapes are only rebuilt when the input shape changes
+        if self._cached_shape is None or self._cached_shape[0] != input_data.shape:
+            batch_size, time_steps, *trailing_dim = input_data.shape
+            self._cached_shape = (
+                input_data.shape,
+                torch.Size((batch_size, *trailing_dim)),
+                torch.Size((batch_size, time_steps, math.prod(trailing_dim))),
+            )
+        original_shape, state_shape, shape_3d = self._cached_shape
 
         # Ensure the neuron state are initialized
-        if not self.is_state_initialised() or not self.state_has_shape(
-            (batch_size, *trailing_dim)
-        ):
-            self.init_state_with_shape((batch_size, *trailing_dim))
+        if not self.is_state_initialised() or not self.state_has_shape(state_shape):
+            self.init_state_with_shape(state_shape)
 
-        # Move time to last dimension -> (n_batches, *trailing_dim, time_steps)
-        # Flatten out all dimensions that can be processed in parallel and ensure contiguity
-        input_2d = input_data.movedim(1, -1).reshape(-1, time_steps)
+        # Flatten out trailing dimensions -> (batch_size, time_steps, N).
+        # Kernels handle this layout directly, so time does not need to be
+        # moved to the last dimension, which would require a copy.
+        input_3d = input_data.reshape(shape_3d).contiguous()
 
-        return input_2d, (batch_size, time_steps, *trailing_dim)
+        return input_3d, original_shape
 
-    def _forward_synaptic(self, input_2d: torch.Tensor):
+    def _forward_synaptic(self, input_3d: torch.Tensor):
         """Evolve synaptic dynamics"""
 
-        alpha_syn = self.alpha_syn_calculated.expand(self.v_mem.shape).flatten()
+        # LeakyIntegrator needs one alpha per neuron in memory
+        alpha_syn = self._per_neuron(self.alpha_syn_calculated).contiguous()
 
         if self.decay_early:
-            input_2d = input_2d * alpha_syn.unsqueeze(1)
+            input_3d = input_3d * neuron_view(alpha_syn, input_3d)
 
         # Apply exponential filter to input
         return LeakyIntegrator.apply(
-            input_2d.contiguous(),  # Input data
-            alpha_syn.contiguous(),  # Synaptic alpha
-            self.i_syn.flatten().contiguous(),  # Initial synaptic states
+            input_3d,  # Input data
+            alpha_syn,  # Synaptic alpha
+            self.i_syn.flatten(),  # Initial synaptic states
         )
 
-    def _forward_membrane(self, i_syn_2d: torch.Tensor):
-        """Evolve membrane dynamics"""
+    def _forward_membrane(
+        self, i_syn_3d: torch.Tensor, spike_count: Optional[torch.Tensor] = None
+    ):
+        """
+        Evolve membrane dynamics. Returned v_mem is before reset. Also returns
+        the float32 v_mem after the last time step and reset, or None if it has
+        not been computed separately.
+        """
 
         # Broadcast alpha to number of neurons (x batches)
-        alpha_mem = self.alpha_mem_calculated.expand(self.v_mem.shape)
-        alpha_mem = alpha_mem.flatten().contiguous()
-
-        if self.norm_input:
-            # Rescale input with 1 - alpha (based on approximation that
-            # alpha = exp(-1/tau) ~ 1 / (1 - tau) for tau >> 1)
-            i_syn_2d = (1.0 - alpha_mem.unsqueeze(1)) * i_syn_2d
+        alpha_mem = self._per_neuron(self.alpha_mem_calculated)
 
         if self.spike_fn is None:
+            # LeakyIntegrator needs one alpha per neuron in memory
+            alpha_mem = alpha_mem.contiguous()
+
+            if self.norm_input:
+                # Rescale input with 1 - alpha (based on approximation that
+                # alpha = exp(-1/tau) ~ 1 / (1 - tau) for tau >> 1)
+                i_syn_3d = neuron_view(1.0 - alpha_mem, i_syn_3d) * i_syn_3d
 
             if self.decay_early:
-                i_syn_2d = i_syn_2d * alpha_mem.unsqueeze(1)
+                i_syn_3d = i_syn_3d * neuron_view(alpha_mem, i_syn_3d)
 
             # - Non-spiking case (leaky integrator)
             v_mem = LeakyIntegrator.apply(
-                i_syn_2d,  # Input data
+                i_syn_3d,  # Input data
                 alpha_mem,  # Membrane alpha
-                self.v_mem.flatten().contiguous(),  # Initial vmem
+                self.v_mem.flatten(),  # Initial vmem
             )
 
-            return v_mem, v_mem
+            return v_mem, v_mem, None
 
-        # Expand membrane subtract
-        membrane_subtract = self.reset_fn.subtract_value
-        if membrane_subtract is None:
-            membrane_subtract = self.spike_threshold
-        membrane_subtract = torch.full_like(alpha_mem, membrane_subtract)
+        membrane_subtract = self._expand_membrane_subtract(alpha_mem)
+        self._validate_alphas(alpha_mem)
+        v_mem_out, spikes_out = self._dynamics_workspaces(i_syn_3d)
+        v_mem_last = self._v_mem_last_out()
 
-        output_2d, v_mem_2d = IntegrateAndFire.apply(
-            i_syn_2d.contiguous(),  # Input data
+        output_3d, v_mem_3d = IntegrateAndFire.apply(
+            self._to_compute_dtype(i_syn_3d),  # Input data
             alpha_mem,  # Alphas
-            self.v_mem.flatten().contiguous(),  # Initial vmem
+            self.v_mem.flatten(),  # Initial vmem
+            self.spike_threshold,  # Spike threshold
+            membrane_subtract,  # Membrane subtract
+            self.min_v_mem,  # Lower bound on vmem
+            # Surrogate gradient, only needed if autograd is recording
+            self.surrogate_grad_fn if torch.is_grad_enabled() else None,
+            self.max_num_spikes_per_bin,  # Max. number of spikes per bin
+            self.norm_input,  # Rescale input with 1 - alpha inside the kernel
+            spike_count,  # Counter for total number of spikes
+            False,  # Inputs are validated by `_validate_alphas`
+            v_mem_out,  # Preallocated v_mem or None
+            spikes_out,  # Preallocated spikes or None
+            self._update_state_pack(),  # Packed alpha and membrane subtract
+            v_mem_last,  # float32 v_mem after last time step or None
+        )
+
+        return output_3d, v_mem_3d, v_mem_last
+
+    def _forward_synaptic_membrane(
+        self, input_3d: torch.Tensor, spike_count: Optional[torch.Tensor] = None
+    ):
+        """
+        Evolve synaptic and membrane dynamics in a single kernel.
+        Returned v_mem is before reset, as for `_forward_membrane`
+        """
+
+        alpha_syn = self._per_neuron(self.alpha_syn_calculated)
+        alpha_mem = self._per_neuron(self.alpha_mem_calculated)
+        membrane_subtract = self._expand_membrane_subtract(alpha_mem)
+        self._validate_alphas(alpha_mem)
+        v_mem_out, spikes_out = self._dynamics_workspaces(input_3d)
+        v_mem_last = self._v_mem_last_out()
+
+        output_3d, v_mem_3d, i_syn_last = SynapticIntegrateAndFire.apply(
+            self._to_compute_dtype(input_3d),  # Input data
+            alpha_syn,  # Synaptic alphas
+            self.i_syn.flatten(),  # Initial synaptic states
+            alpha_mem,  # Membrane alphas
+            self.v_mem.flatten(),  # Initial vmem
             self.spike_threshold,  # Spike threshold
             membrane_subtract,  # Membrane subtract
             self.min_v_mem,  # Lower bound on vmem
-            self.surrogate_grad_fn,  # Surrogate gradient
+            # Surrogate gradient, only needed if autograd is recording
+            self.surrogate_grad_fn if torch.is_grad_enabled() else None,
             self.max_num_spikes_per_bin,  # Max. number of spikes per bin
+            self.norm_input,  # Rescale synaptic currents with 1 - alpha_mem
+            self.decay_early,  # Rescale input with alpha_syn
+            spike_count,  # Counter for total number of spikes
+            False,  # Inputs are validated by `_validate_alphas`
+            v_mem_out,  # Preallocated v_mem or None
+            spikes_out,  # Preallocated spikes or None
+            self._update_state_pack(),  # Packed alphas and membrane subtract
+            v_mem_last,  # float32 v_mem after last time step or None
         )
-        # Apply reset to membrne potential
-        v_mem_2d = v_mem_2d - membrane_subtract.unsqueeze(1) * output_2d
 
-        return output_2d, v_mem_2d
+        return output_3d, v_mem_3d, v_mem_last, i_syn_last
+
+    def _validate_alphas(self, alpha_mem: torch.Tensor):
+        """
+        Make sure that membrane alphas are between 0 and 1. This requires a device
+        synchronization, so it is only repeated if the time constants have been
+        replaced or modified in-place since the last check.
+        """
+        key = self._alpha_key()
+        if key == self._validated_alpha_key:
+            return
+        if (alpha_mem < 0).any() or (alpha_mem > 1).any():
+            raise ValueError("'alpha' must be between 0 and 1.")
+        self._validated_alpha_key = key
+
+    def _update_state_pack(self) -> torch.Tensor:
+        """
+        Per-neuron parameters of the spiking dynamics, packed by `_pack_params`.
+        Unless time constants have a batch dimension, they are packed with one
+        row per neuron of a single sample, or a single row if all of them are
+        scalars, rather than with one row per neuron and batch. The buffer is
+        only refilled, in place, after the time constants, the membrane
+        subtract value or the shape of the neuron states have changed.
+        """
+        key = (
+            self._alpha_key(),
+            self._alpha_key(synaptic=True),
+            self._membrane_subtract_value,
+            self.v_mem.shape,
+            self.v_mem.device,
+        )
+        if key == self._state_pack_key:
+            return self._state_pack
+
+        with torch.no_grad():
+            alpha_mem = self.alpha_mem_calculated
+            alpha_syn = self.alpha_syn_calculated
+            shape = self.v_mem.shape
+            if all(a is None or a.ndim < len(shape) for a in (alpha_mem, alpha_syn)):
+                shape = shape[1:]
+
+            def rows(value):
+                # Scalars become broadcast views, which are packed into one row
+                return value.expand(shape).reshape(-1)
+
+            state_pack = _pack_params(
+                rows(alpha_mem),
+                rows(alpha_mem.new_tensor(self._membrane_subtract_value)),
+                None if alpha_syn is None else rows(alpha_syn),
+            )
+            if (
+                self._state_pack is not None
+                and self._state_pack.shape == state_pack.shape
+                and self._state_pack.device == state_pack.device
+            ):
+                # Captured CUDA graphs read from the existing buffer
+                self._state_pack.copy_(state_pack)
+            else:
+                self._state_pack = state_pack
+
+        self._state_pack_key = key
+        return self._state_pack
+
+    def _v_mem_last_out(self) -> Optional[torch.Tensor]:
+        """
+        float32 tensor to which the spiking dynamics write the membrane potentials
+        after the last time step and reset, without rounding them to
+        `compute_dtype`. None with autograd, where the new state is derived from
+        the returned membrane potentials, such that it remains differentiable.
+        """
+        if torch.is_grad_enabled():
+            return None
+        return torch.empty(
+            self.v_mem.numel(), dtype=torch.float32, device=self.v_mem.device
+        )
+
+    def _dynamics_workspaces(self, input_3d: torch.Tensor) -> tuple:
+        """
+        Preallocated tensors for v_mem and spikes computed by the spiking dynamics,
+        or None where a new tensor needs to be allocated.
+
+        Workspaces are only used where their content does not outlive the forward
+        pass. Without autograd and recordings, v_mem is only needed to derive the
+        new state, and spikes only if they are converted to the input dtype
+        afterwards. Graph capture allocates its own memory instead.
+
+        Parameters
+        ----------
+        input_3d: torch.Tensor
+            Input to the spiking dynamics, before conversion to `compute_dtype`
+        """
+        if (
+            torch.is_grad_enabled()
+            or self.record_states
+            or (input_3d.is_cuda and torch.cuda.is_current_stream_capturing())
+        ):
+            return None, None
+
+        dtype = self.compute_dtype or input_3d.dtype
+        v_mem_out = self._workspace("_ws_vmem", input_3d.shape, dtype, input_3d.device)
+
+        # Without autograd, the spiking dynamics get no surrogate gradient
+        # function, so they do not differentiate spikes either, even if states
+        # or trainable alphas require gradients
+        spike_dtype = _spike_dtype(dtype, self.max_num_spikes_per_bin, False)
+        if spike_dtype == input_3d.dtype:
+            # Spikes would be returned to the caller
+            spikes_out = None
+        else:
+            spikes_out = self._workspace(
+                "_ws_spk", input_3d.shape, spike_dtype, input_3d.device
+            )
+
+        return v_mem_out, spikes_out
+
+    def _workspace(
+        self,
+        name: str,
+        shape: torch.Size,
+        dtype: torch.dtype,
+        device: torch.device,
+    ) -> torch.Tensor:
+        """
+        View of the workspace buffer attribute `name` with given shape. The
+        buffer is replaced by a larger one if needed.
+        """
+        numel = shape.numel()
+        workspace = getattr(self, name)
+        if (
+            workspace is None
+            or workspace.dtype != dtype
+            or workspace.device != device
+            or workspace.numel() < numel
+        ):
+            workspace = torch.empty(numel, dtype=dtype, device=device)
+            setattr(self, name, workspace)
+        return workspace[:numel].view(shape)
+
+    def release_workspaces(self):
+        """
+        Free memory of buffers that are reused between forward passes, including
+        captured CUDA graphs and their static buffers
+        """
+        self._ws_vmem = None
+        self._ws_spk = None
+        self._state_pack = None
+        self._state_pack_key = None
+        self._graph_cache.clear()
+        self._graph_pool = None
+
+    def _alpha_key(self, synaptic: bool = False) -> tuple:
+        """
+        Identify the current version of the membrane time constants, or of the
+        synaptic ones if `synaptic` is True. In-place modifications increase
+        `_version`, assignments to `.data` change the data pointer. Edits
+        through `.data` in place are not detected.
+        """
+        if synaptic:
+            source = self.alpha_syn if self.train_alphas else self.tau_syn
+        else:
+            source = self.alpha_mem if self.train_alphas else self.tau_mem
+        if not isinstance(source, torch.Tensor):
+            return (id(source), None, None)
+        return (id(source), source._version, source.data_ptr())
+
+    def _to_compute_dtype(self, data: torch.Tensor) -> torch.Tensor:
+        """Convert input of spiking dynamics to `compute_dtype`, if set"""
+        if self.compute_dtype is None:
+            return data
+        return data.to(self.compute_dtype)
+
+    @property
+    def _membrane_subtract_value(self) -> float:
+        """Value that is subtracted from membrane potential per spike"""
+        membrane_subtract = self.reset_fn.subtract_value
+        if membrane_subtract is None:
+            membrane_subtract = self.spike_threshold
+        return membrane_subtract
+
+    def _expand_membrane_subtract(self, alpha_mem: torch.Tensor) -> torch.Tensor:
+        """Broadcast membrane subtract value to same shape as `alpha_mem`, as a view"""
+        return alpha_mem.new_full((1,), self._membrane_subtract_value).expand_as(
+            alpha_mem
+        )
+
+    def _per_neuron(self, value: torch.Tensor) -> torch.Tensor:
+        """
+        Broadcast a parameter, which is either a scalar, or has one entry per
+        channel or per neuron, to shape (N,), with one entry per neuron and batch.
+
+        A single value becomes a view with stride 0, which is validated and saved
+        for the backward pass without copying it N times. Other values need to be
+        materialized, unless they already have an entry for each neuron. The
+        spiking dynamics read parameters from the state pack instead, see
+        `_update_state_pack`.
+        """
+        n_neurons = self.v_mem.numel()
+        if value.numel() == 1:
+            return value.reshape(1).expand(n_neurons)
+        return value.expand(self.v_mem.shape).reshape(n_neurons)
 
     def forward(self, input_data: torch.Tensor):
         """
@@ -230,42 +630,254 @@ class LIF(LIFSinabs):
                 Output data. Same shape as `input_data`.
         """
 
-        input_2d, original_shape = self._prepare_input(input_data)
-        batch_size, time_steps, *trailing_dim = original_shape
+        if (
+            self.use_cuda_graphs
+            and input_data.is_cuda
+            and not torch.is_grad_enabled()
+            and not self.record_states
+        ):
+            return self._graphed_forward(input_data)
 
-        self.recordings = dict()
+        return self._uncaptured_forward(input_data)
 
-        # - Synaptic dynamics
+    @property
+    def _graph_state_names(self) -> tuple:
+        """Names of neuron states that are carried over between forward passes"""
         if self.tau_syn_calculated is None:
-            i_syn_2d = input_2d
-        else:
-            i_syn_2d = self._forward_synaptic(input_2d)
+            return ("v_mem",)
+        return ("v_mem", "i_syn")
 
-            # Bring i_syn to shape that matches input
-            i_syn_full = i_syn_2d.reshape(batch_size, *trailing_dim, -1).movedim(-1, 1)
+    def _graph_key(self, input_data: torch.Tensor) -> tuple:
+        """
+        Identify a captured forward pass. Includes everything that is baked into
+        the graph, such as scalar kernel arguments, the spike generation and reset
+        mechanisms, or the memory of the tensors that time constants are computed
+        from. Time constants are identified by their data pointer, which the
+        graph reads from, and not only by `id`, which can be reused by a new
+        tensor. In-place modifications are picked up by the replayed graph.
+        """
+        time_constants = (
+            (self.alpha_mem, self.alpha_syn)
+            if self.train_alphas
+            else (self.tau_mem, self.tau_syn)
+        )
+        return (
+            tuple(input_data.shape),
+            input_data.dtype,
+            input_data.device,
+            tuple(
+                None if t is None else (id(t), t.data_ptr(), tuple(t.shape))
+                for t in time_constants
+            ),
+            self.spike_fn,
+            self.max_num_spikes_per_bin,
+            type(self.reset_fn),
+            getattr(self.reset_fn, "subtract_value", None),
+            self.spike_threshold,
+            self.min_v_mem,
+            self.compute_dtype,
+            self.norm_input,
+            self.decay_early,
+        )
 
-            # Update internal i_syn
-            self.i_syn = i_syn_full[:, -1].clone()
-            if self.record_states:
-                self.recordings["i_syn"] = i_syn_full
+    def _graphed_forward(self, input_data: torch.Tensor) -> torch.Tensor:
+        """
+        Run forward pass by replaying a CUDA graph. The first call for a given
+        configuration runs eagerly, the second one captures the graph.
+        """
+        key = self._graph_key(input_data)
+
+        if key not in self._graph_cache:
+            # Only capture configurations that are used repeatedly. Graphs for
+            # other configurations are dropped, such that inputs of varying
+            # shape do not accumulate graphs and static buffers.
+            self._graph_cache.clear()
+            self._graph_cache[key] = None
+            return self._uncaptured_forward(input_data)
+
+        # States might have been initialized for a different shape
+        self._prepare_input(input_data)
+
+        if self._graph_cache[key] is None:
+            self._graph_cache[key] = self._capture_forward(input_data)
+
+        graph, static_input, static_states, static_outputs = self._graph_cache[key]
+
+        # Time constants may have been modified in place since the capture.
+        # The graph reads parameters from the state pack, which is refilled in place.
+        if self.spike_fn is not None:
+            if self._alpha_key() != self._validated_alpha_key:
+                self._validate_alphas(self.alpha_mem_calculated)
+            self._update_state_pack()
+
+        static_input.copy_(input_data)
+        for name, static_state in static_states.items():
+            static_state.copy_(getattr(self, name))
+
+        graph.replay()
+
+        # Copies, such that the next replay does not overwrite results
+        output, firing_rate, *new_states = (t.clone() for t in static_outputs)
+        for name, state in zip(static_states, new_states):
+            setattr(self, name, state)
+        self.firing_rate = firing_rate
+        self.recordings = dict()
 
-        # - Membrane dynamics
-        output_2d, v_mem_2d = self._forward_membrane(i_syn_2d)
+        return output
+
+    def _capture_forward(self, input_data: torch.Tensor) -> tuple:
+        """
+        Capture a forward pass for inputs like `input_data` into a CUDA graph.
 
-        # Reshape output spikes and v_mem_full, store neuron states
-        v_mem_full = v_mem_2d.reshape(batch_size, *trailing_dim, -1).movedim(-1, 1)
-        output_full = output_2d.reshape(batch_size, *trailing_dim, -1).movedim(-1, 1)
+        Returns
+        -------
+        torch.cuda.CUDAGraph
+            The captured graph
+        torch.Tensor
+            Static input, into which input data needs to be copied before replay
+        dict
+            Static neuron states, read by the graph, keyed by state name
+        tuple of torch.Tensor
+            Static output, firing rate and new neuron states, written by the graph
+        """
+        if self._graph_pool is None:
+            self._graph_pool = torch.cuda.graph_pool_handle()
+
+        # States before this forward pass, to be restored after capture
+        current_states = {name: getattr(self, name) for name in self._graph_state_names}
+
+        static_input = input_data.clone()
+        static_states = {name: s.clone() for name, s in current_states.items()}
+
+        # Warm up on a side stream, as required before capture
+        side_stream = torch.cuda.Stream()
+        side_stream.wait_stream(torch.cuda.current_stream())
+        with torch.cuda.stream(side_stream):
+            for name, static_state in static_states.items():
+                setattr(self, name, static_state)
+            self._uncaptured_forward(static_input)
+        torch.cuda.current_stream().wait_stream(side_stream)
+
+        for name, static_state in static_states.items():
+            setattr(self, name, static_state)
+
+        graph = torch.cuda.CUDAGraph()
+        with torch.cuda.graph(graph, pool=self._graph_pool):
+            static_output = self._uncaptured_forward(static_input)
+
+        static_outputs = (
+            static_output,
+            self.firing_rate,
+            *(getattr(self, name) for name in static_states),
+        )
 
-        if self.record_states:
-            self.recordings["v_mem"] = v_mem_full
+        for name, state in current_states.items():
+            setattr(self, name, state)
 
-        # update neuron states
-        self.v_mem = v_mem_full[:, -1].clone()
+        return graph, static_input, static_states, static_outputs
 
-        self.firing_rate = output_full.sum() / output_full.numel()
+    def _uncaptured_forward(self, input_data: torch.Tensor) -> torch.Tensor:
+        """Forward pass with given data, launching each kernel individually"""
+
+        input_3d, original_shape = self._prepare_input(input_data)
+
+        self.recordings = dict()
+
+        if self.spike_fn is not None and not torch.is_grad_enabled():
+            # Firing rate does not need to be differentiable, so spikes can be
+            # counted inside the kernel, instead of reducing the output again
+            spike_count = torch.zeros((), dtype=torch.int64, device=input_3d.device)
+        else:
+            spike_count = None
+
+        if (
+            self.tau_syn_calculated is not None
+            and self.spike_fn is not None
+            and not self.record_states
+        ):
+            # - Synaptic and membrane dynamics in one pass, without
+            #   intermediate synaptic currents being written to memory
+            (
+                output_3d,
+                v_mem_3d,
+                v_mem_last,
+                i_syn_last,
+            ) = self._forward_synaptic_membrane(input_3d, spike_count)
+            # States have been initialized with shape (batch_size, *trailing_dim)
+            self.i_syn = i_syn_last.reshape(self.v_mem.shape)
+
+        else:
+            # - Synaptic dynamics
+            if self.tau_syn_calculated is None:
+                i_syn_3d = input_3d
+            else:
+                i_syn_3d = self._forward_synaptic(input_3d)
+
+                # Bring i_syn to shape that matches input
+                i_syn_full = i_syn_3d.reshape(original_shape)
+
+                # Update internal i_syn
+                self.i_syn = i_syn_full[:, -1].clone()
+                if self.record_states:
+                    self.recordings["i_syn"] = i_syn_full
+
+            # - Membrane dynamics
+            output_3d, v_mem_3d, v_mem_last = self._forward_membrane(
+                i_syn_3d, spike_count
+            )
+
+        if self.spike_fn is None:
+            if self.record_states:
+                self.recordings["v_mem"] = v_mem_3d.reshape(original_shape)
+            membrane_subtract = None
+        elif self.record_states:
+            # Apply reset to membrane potential
+            v_mem_3d = v_mem_3d - self._membrane_subtract_value * output_3d
+            self.recordings["v_mem"] = v_mem_3d.reshape(original_shape)
+            membrane_subtract = None
+        else:
+            membrane_subtract = self._membrane_subtract_value
+
+        pack_outputs = _compiled_pack_outputs() if self.compile_epilogue else _pack_outputs
+        output_full, v_mem_last, self.firing_rate = pack_outputs(
+            output_3d,
+            v_mem_3d,
+            spike_count,
+            membrane_subtract,
+            original_shape,
+            input_data.dtype,
+            self.v_mem.dtype,
+            v_mem_last,
+        )
+        self.v_mem = v_mem_last
 
         return output_full
 
+    @property
+    def _param_dict(self) -> dict:
+        param_dict = super()._param_dict
+        param_dict.update(
+            decay_early=self.decay_early,
+            compute_dtype=self.compute_dtype,
+            use_cuda_graphs=self.use_cuda_graphs,
+            compile_epilogue=self.compile_epilogue,
+        )
+        return param_dict
+
+    def __getstate__(self):
+        # Captured CUDA graphs cannot be copied or pickled. Like the buffers that
+        # are reused between forward passes, they are recreated when needed.
+        state = self.__dict__.copy()
+        state.update(
+            _graph_cache=dict(),
+            _graph_pool=None,
+            _ws_vmem=None,
+            _ws_spk=None,
+            _state_pack=None,
+            _state_pack_key=None,
+        )
+        return state
+
     def __repr__(self):
         return "EXODUS " + super().__repr__()
 
@@ -1,6 +1,8 @@
-import exodus_cuda
 import torch
 
+from sinabs.exodus import ops
+from sinabs.exodus.utils import time_step
+
 
 class LeakyIntegrator(torch.autograd.Function):
     @staticmethod
@@ -19,7 +21,8 @@ class LeakyIntegrator(torch.autograd.Function):
         inp: torch.tensor
             2D input tensor, shape: (N, T_sim), where N is
             *anything* that can be computed in parallel, i.e. batches, neurons...
-            Has to be contiguous.
+            Alternatively 3D, shape (batch_size, T_sim, N / batch_size), which
+            avoids moving the time dimension of layer inputs. Has to be contiguous.
         alpha : torch.Tensor
             1D, shape: (N,). State decay factor (exp(-dt/tau)). Set 1 for IAF neurons.
         v_mem_init: torch.Tensor
@@ -27,8 +30,8 @@ class LeakyIntegrator(torch.autograd.Function):
             be contiguous.
         """
 
-        if not inp.ndim == 2:
-            raise ValueError("'inp' must be 2D, (N, Time)")
+        if inp.ndim not in (2, 3):
+            raise ValueError("'inp' must be 2D, (N, Time), or 3D, (Batches, Time, N)")
         if not inp.is_contiguous():
             raise ValueError("'inp' has to be contiguous.")
         if not alpha.ndim == 1:
@@ -40,7 +43,7 @@ class LeakyIntegrator(torch.autograd.Function):
         if not v_mem_init.is_contiguous():
             raise ValueError("'v_mem_init' has to be contiguous.")
 
-        out = exodus_cuda.leakyForward(inp, v_mem_init, alpha)
+        out = ops.leaky_forward(inp, v_mem_init, alpha)
 
         ctx.get_alpha_grads = alpha.requires_grad
         if alpha.requires_grad:
@@ -53,23 +56,19 @@ class LeakyIntegrator(torch.autograd.Function):
     @staticmethod
     def backward(ctx, grad_output):
 
+        # Saved tensors have been checked to be contiguous in the forward pass
+        grad_output = grad_output.contiguous()
+
         if ctx.get_alpha_grads:
             out, v_mem_init, alpha = ctx.saved_tensors
-            grad_alpha = exodus_cuda.leakyBackwardAlpha(
-                grad_output.contiguous(),
-                out.contiguous(),
-                v_mem_init.contiguous(),
-                alpha.contiguous(),
-            )
+            grad_alpha = ops.leaky_backward_alpha(grad_output, out, v_mem_init, alpha)
         else:
             (alpha,) = ctx.saved_tensors
             grad_alpha = None
 
-        grad_input = exodus_cuda.leakyBackward(
-            grad_output.contiguous(), alpha.contiguous()
-        )
+        grad_input = ops.leaky_backward(grad_output, alpha)
 
-        grad_init = alpha * grad_input[:, 0]
+        grad_init = alpha * time_step(grad_input, 0)
 
         # Backpropagate one more decay step from first time point.
         # Works because v_1 = alpha * v_init
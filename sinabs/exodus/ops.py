@@ -0,0 +1,298 @@
+"""
+Wrappers around the functions of the `exodus_cuda` extension.
+
+If the installed torch version supports it, each wrapper is registered as a
+custom operator in the `exodus` namespace. TorchDynamo can then trace through
+the autograd functions in this package instead of breaking the graph at each
+call into the extension, so that `torch.compile` can fuse the surrounding
+reshapes, scalings and reductions.
+
+LIF dynamics on CPU tensors are evolved by numba-compiled functions in
+`sinabs.exodus.cpu`, if numba is installed.
+"""
+
+from typing import Callable, Iterable, Optional
+
+import torch
+
+try:
+    import exodus_cuda
+except ImportError:
+    # CPU-only installation
+    exodus_cuda = None
+
+try:
+    from sinabs.exodus.cpu import lif_numba
+except ImportError:
+    lif_numba = None
+
+
+def _custom_op(name: str, mutates_args: Iterable[str] = ()):
+    """Register decorated function as custom operator `exodus::<name>` if supported"""
+
+    def decorator(fn: Callable) -> Callable:
+        if not hasattr(torch.library, "custom_op"):
+            # Before torch 2.4
+            return fn
+        return torch.library.custom_op(f"exodus::{name}", mutates_args=mutates_args)(fn)
+
+    return decorator
+
+
+def _cpu_backend():
+    """numba implementations of LIF dynamics, for tensors on CPU"""
+    if lif_numba is None:
+        raise RuntimeError(
+            "EXODUS requires numba to process tensors on CPU. "
+            "Install it or move the tensors to a CUDA device."
+        )
+    return lif_numba
+
+
+def _cuda_backend(name: str) -> Callable:
+    """Function `name` of the `exodus_cuda` extension, for tensors on CUDA devices"""
+    if exodus_cuda is None:
+        raise RuntimeError(
+            f"EXODUS operation '{name}' requires the `exodus_cuda` extension, which "
+            "is not installed. It is only implemented for tensors on CUDA devices."
+        )
+    return getattr(exodus_cuda, name)
+
+
+def _register_fake(op: Callable):
+    """Register decorated function as fake (meta) implementation of `op`"""
+
+    def decorator(fn: Callable) -> Callable:
+        if hasattr(op, "register_fake"):
+            op.register_fake(fn)
+        return fn
+
+    return decorator
+
+
+# - LIF dynamics
+
+
+@_custom_op(
+    "lif_forward",
+    mutates_args=("output_spikes", "v_mem", "v_mem_last", "spike_count"),
+)
+def lif_forward(
+    output_spikes: torch.Tensor,
+    v_mem: torch.Tensor,
+    v_mem_last: Optional[torch.Tensor],
+    inp: torch.Tensor,
+    params: torch.Tensor,
+    v_mem_init: torch.Tensor,
+    threshold: float,
+    min_v_mem: float,
+    apply_min_v_mem: bool,
+    max_num_spikes_per_bin: int,
+    norm_input: bool,
+    spike_count: Optional[torch.Tensor] = None,
+) -> None:
+    if not inp.is_cuda:
+        _cpu_backend().lif_forward(
+            output_spikes,
+            v_mem,
+            v_mem_last,
+            inp,
+            params,
+            v_mem_init,
+            threshold,
+            min_v_mem,
+            apply_min_v_mem,
+            max_num_spikes_per_bin,
+            norm_input,
+            spike_count,
+        )
+        return
+    _cuda_backend("lifForward")(
+        output_spikes,
+        v_mem,
+        v_mem_last,
+        inp,
+        params,
+        v_mem_init,
+        threshold,
+        min_v_mem,
+        apply_min_v_mem,
+        max_num_spikes_per_bin,
+        norm_input,
+        spike_count,
+    )
+
+
+@_register_fake(lif_forward)
+def _(
+    output_spikes,
+    v_mem,
+    v_mem_last,
+    inp,
+    params,
+    v_mem_init,
+    threshold,
+    min_v_mem,
+    apply_min_v_mem,
+    max_num_spikes_per_bin,
+    norm_input,
+    spike_count=None,
+):
+    return None
+
+
+@_custom_op(
+    "lif_syn_forward",
+    mutates_args=(
+        "output_spikes",
+        "v_mem",
+        "v_mem_last",
+        "i_syn",
+        "i_syn_last",
+        "spike_count",
+    ),
+)
+def lif_syn_forward(
+    output_spikes: torch.Tensor,
+    v_mem: torch.Tensor,
+    v_mem_last: Optional[torch.Tensor],
+    i_syn: Optional[torch.Tensor],
+    i_syn_last: torch.Tensor,
+    inp: torch.Tensor,
+    params: torch.Tensor,
+    v_mem_init: torch.Tensor,
+    i_syn_init: torch.Tensor,
+    threshold: float,
+    min_v_mem: float,
+    apply_min_v_mem: bool,
+    max_num_spikes_per_bin: int,
+    norm_input: bool,
+    decay_early: bool,
+    spike_count: Optional[torch.Tensor] = None,
+) -> None:
+    _cuda_backend("lifSynForward")(
+        output_spikes,
+        v_mem,
+        v_mem_last,
+        i_syn,
+        i_syn_last,
+        inp,
+        params,
+        v_mem_init,
+        i_syn_init,
+        threshold,
+        min_v_mem,
+        apply_min_v_mem,
+        max_num_spikes_per_bin,
+        norm_input,
+        decay_early,
+        spike_count,
+    )
+
+
+@_register_fake(lif_syn_forward)
+def _(
+    output_spikes,
+    v_mem,
+    v_mem_last,
+    i_syn,
+    i_syn_last,
+    inp,
+    params,
+    v_mem_init,
+    i_syn_init,
+    threshold,
+    min_v_mem,
+    apply_min_v_mem,
+    max_num_spikes_per_bin,
+    norm_input,
+    decay_early,
+    spike_count=None,
+):
+    return None
+
+
+@_custom_op("lif_backward", mutates_args=("grad_alpha",))
+def lif_backward(
+    surrogates: torch.Tensor,
+    grad_output: torch.Tensor,
+    not_clipped: Optional[torch.Tensor],
+    state: torch.Tensor,
+    grad_alpha: Optional[torch.Tensor] = None,
+    v_mem_post: Optional[torch.Tensor] = None,
+    v_mem_init: Optional[torch.Tensor] = None,
+) -> torch.Tensor:
+    if not surrogates.is_cuda:
+        return _cpu_backend().lif_backward(
+            surrogates,
+            grad_output,
+            not_clipped,
+            state,
+            grad_alpha,
+            v_mem_post,
+            v_mem_init,
+        )
+    return _cuda_backend("lifBackward")(
+        surrogates,
+        grad_output,
+        not_clipped,
+        state,
+        grad_alpha,
+        v_mem_post,
+        v_mem_init,
+    )
+
+
+@_register_fake(lif_backward)
+def _(
+    surrogates,
+    grad_output,
+    not_clipped,
+    state,
+    grad_alpha=None,
+    v_mem_post=None,
+    v_mem_init=None,
+):
+    return torch.empty_like(surrogates)
+
+
+# - Leaky integrators
+
+
+@_custom_op("leaky_forward")
+def leaky_forward(
+    inp: torch.Tensor, v_mem_init: torch.Tensor, alpha: torch.Tensor
+) -> torch.Tensor:
+    return _cuda_backend("leakyForward")(inp, v_mem_init, alpha)
+
+
+@_register_fake(leaky_forward)
+def _(inp, v_mem_init, alpha):
+    return torch.empty_like(inp)
+
+
+@_custom_op("leaky_backward")
+def leaky_backward(grad_output: torch.Tensor, alpha: torch.Tensor) -> torch.Tensor:
+    return _cuda_backend("leakyBackward")(grad_output, alpha)
+
+
+@_register_fake(leaky_backward)
+def _(grad_output, alpha):
+    return torch.empty_like(grad_output)
+
+
+@_custom_op("leaky_backward_alpha")
+def leaky_backward_alpha(
+    grad_output: torch.Tensor,
+    output: torch.Tensor,
+    v_mem_init: torch.Tensor,
+    alpha: torch.Tensor,
+) -> torch.Tensor:
+    return _cuda_backend("leakyBackwardAlpha")(
+        grad_output, output, v_mem_init, alpha
+    )
+
+
+@_register_fake(leaky_backward_alpha)
+def _(grad_output, output, v_mem_init, alpha):
+    return torch.empty_like(alpha)
@@ -1,7 +1,157 @@
 from typing import Callable, Optional
 
 import torch
-import exodus_cuda
+
+from sinabs.exodus import ops
+from sinabs.exodus.utils import neuron_view, time_step
+
+
+# Data types supported for inputs and outputs of the LIF forward kernels.
+# Neuron states and gradients are always float32.
+SUPPORTED_DTYPES = (torch.float32, torch.float16, torch.bfloat16)
+
+
+def _check_dtype(inp: torch.Tensor):
+    """Make sure the kernels support the dtype of `inp`. Cheap, so always done."""
+    if inp.dtype not in SUPPORTED_DTYPES:
+        raise ValueError(f"'inp' must be of one of the dtypes {SUPPORTED_DTYPES}.")
+
+
+def _validate_inputs(inp: torch.Tensor, **per_neuron: torch.Tensor):
+    """
+    Check shapes and layout of inputs to LIF dynamics, as well as the range
+    of `alpha`. The latter requires a device synchronization.
+    """
+    if inp.ndim not in (2, 3):
+        raise ValueError("'inp' must be 2D, (N, Time), or 3D, (Batches, Time, N)")
+    if not inp.is_contiguous():
+        raise ValueError("'inp' has to be contiguous.")
+    for name, tensor in per_neuron.items():
+        if not tensor.ndim == 1:
+            raise ValueError(f"'{name}' must be 1D, (N,)")
+
+    alpha = per_neuron["alpha"]
+    if (alpha < 0).any() or (alpha > 1).any():
+        raise ValueError("'alpha' must be between 0 and 1.")
+
+
+def _spike_dtype(
+    inp_dtype: torch.dtype, max_num_spikes_per_bin: Optional[int], needs_grad: bool
+) -> torch.dtype:
+    """
+    Spikes are stored as uint8 if they are not differentiated and there cannot be
+    more than 255 per time step. Otherwise they have the same dtype as the input.
+
+    Within the LIF autograd functions, spikes are differentiated only if a
+    `surrogate_grad_fn` is passed and any input requires gradients. Inputs such
+    as trainable time constants require gradients even under `torch.no_grad`,
+    so the former is what tells whether autograd is recording.
+    """
+    if needs_grad or max_num_spikes_per_bin is None or max_num_spikes_per_bin > 255:
+        return inp_dtype
+    return torch.uint8
+
+
+def _output_tensor(
+    out: Optional[torch.Tensor], like: torch.Tensor, dtype: torch.dtype
+) -> torch.Tensor:
+    """
+    Tensor that a kernel writes an output to. A preallocated tensor `out` is used
+    if provided, which must have the same shape as `like` and the given dtype.
+    """
+    if out is None:
+        return torch.empty_like(like, dtype=dtype)
+    if out.shape != like.shape or out.dtype != dtype:
+        raise ValueError(
+            f"Preallocated output must have shape {tuple(like.shape)} and dtype {dtype}."
+        )
+    return out
+
+
+def _pack_params(
+    alpha: torch.Tensor,
+    membrane_subtract: torch.Tensor,
+    alpha_syn: Optional[torch.Tensor] = None,
+) -> torch.Tensor:
+    """
+    Pack per-neuron parameters of the LIF forward kernels into one (P, 4) float32
+    buffer with columns (alpha, membrane_subtract, alpha_syn, 1 - alpha), such that
+    each neuron's parameters are loaded with a single aligned access. The alpha_syn
+    column is 0 without synaptic dynamics.
+
+    Parameters are 1D with P or a single entry. Kernels repeat the rows along the
+    neuron index, so P can also be the number of neurons per batch. If all
+    parameters are broadcast views of a single value, a single row is packed.
+    """
+    per_neuron = [x for x in (alpha, membrane_subtract, alpha_syn) if x is not None]
+    if all(x.stride(0) == 0 for x in per_neuron):
+        alpha, membrane_subtract = alpha[:1], membrane_subtract[:1]
+        if alpha_syn is not None:
+            alpha_syn = alpha_syn[:1]
+
+    alpha = alpha.detach().float()
+    if alpha_syn is None:
+        alpha_syn = torch.zeros_like(alpha)
+    columns = torch.broadcast_tensors(
+        alpha,
+        membrane_subtract.detach().float(),
+        alpha_syn.detach().float(),
+        1.0 - alpha,
+    )
+    return torch.stack(columns, dim=1)
+
+
+def _backward_state(
+    alpha: torch.Tensor, membrane_subtract: torch.Tensor
+) -> torch.Tensor:
+    """
+    Pack per-neuron parameters of the LIF backward kernels into one (N, 2) buffer,
+    such that each neuron's parameters are loaded with a single aligned access.
+    Scaling membrane_subtract with alpha compensates for different execution order
+    in forward pass (i.e. reset happens after spiking and before decay, whereas
+    backward pass assumes reset to happen after decay).
+
+    As for `_pack_params`, broadcast views of single values are packed into a
+    single row, which the kernels repeat along the neuron index.
+    """
+    if alpha.stride(0) == 0 and membrane_subtract.stride(0) == 0:
+        alpha, membrane_subtract = alpha[:1], membrane_subtract[:1]
+    return torch.stack((alpha, alpha * membrane_subtract), dim=1).float()
+
+
+def _saved_tensors(ctx) -> tuple:
+    """
+    Tensors saved by the forward pass. Raise an error if there are none, which
+    happens when the forward pass was called without `surrogate_grad_fn`.
+    """
+    saved = ctx.saved_tensors
+    if not saved:
+        raise RuntimeError(
+            "Cannot backpropagate through spike generation, because no surrogate "
+            "gradients have been computed. Pass a `surrogate_grad_fn` to the "
+            "forward pass."
+        )
+    return saved
+
+
+def _grad_v_pre_reset(
+    surrogates: torch.Tensor,
+    grad_output: Optional[torch.Tensor],
+    grad_v_mem: Optional[torch.Tensor],
+) -> torch.Tensor:
+    """Gradient wrt. v_mem before reset, from gradients wrt. spikes and v_mem"""
+    # Backward pass is always computed in float32
+    if grad_output is not None:
+        grad_output = grad_output.float()
+    if grad_v_mem is not None:
+        grad_v_mem = grad_v_mem.float()
+    if grad_output is None and grad_v_mem is None:
+        return torch.zeros_like(surrogates)
+    if grad_v_mem is None:
+        return (surrogates * grad_output).contiguous()
+    if grad_output is None:
+        return grad_v_mem.contiguous()
+    return torch.addcmul(grad_v_mem, surrogates, grad_output).contiguous()
 
 
 class SpikeFunction(torch.autograd.Function):
@@ -33,7 +183,10 @@ class SpikeFunction(torch.autograd.Function):
         alpha : float
             State decay factor (exp(-dt/tau)). Set 1 for IAF neurons.
         surrogate_grad_fn: Callable
-            Calculates surrogate gradients as function of v_mem
+            Calculates surrogate gradients as function of v_mem. Surrogate
+            gradients are evaluated during the forward pass, if any input
+            requires gradients. Can be None if no backward pass is needed,
+            in which case calling backward raises a RuntimeError.
         threshold: float
             Firing threshold
         min_v_mem: float
@@ -55,7 +208,7 @@ class SpikeFunction(torch.autograd.Function):
         if min_v_mem is not None and (threshold <= min_v_mem):
             raise ValueError("`threshold` must be greater than `min_v_mem`.")
 
-        spikes = exodus_cuda.spikeForward(
+        spikes = ops._cuda_backend("spikeForward")(
             v_mem,
             alpha,
             membrane_subtract,
@@ -66,37 +219,42 @@ class SpikeFunction(torch.autograd.Function):
         )
 
         ctx.alpha = alpha
-        ctx.threshold = threshold
-        ctx.min_v_mem = min_v_mem
         ctx.membrane_subtract = membrane_subtract
-        ctx.surrogate_grad_fn = surrogate_grad_fn
-        ctx.save_for_backward(v_mem)
+        # Gradients of unused outputs are passed to backward as None
+        # rather than as tensors of zeros
+        ctx.set_materialize_grads(False)
+
+        if surrogate_grad_fn is not None and any(ctx.needs_input_grad):
+            # Surrogate gradients and clipping mask are plain pointwise functions
+            # of v_mem and are evaluated here, so backward only has to combine
+            # them with the incoming gradients.
+            surrogates = surrogate_grad_fn(v_mem, threshold)
+            # Indicate whether membrane potential (probably) has been clipped
+            not_clipped = None if min_v_mem is None else v_mem > min_v_mem
+            ctx.save_for_backward(surrogates, not_clipped)
 
         return spikes, v_mem
 
     @staticmethod
     def backward(ctx, grad_output, grad_v_mem):
 
-        if torch.nonzero(grad_v_mem).any():
+        # Zero gradients wrt. v_mem, e.g. from unused outputs, are tolerated
+        if grad_v_mem is not None and grad_v_mem.any():
             raise NotImplementedError(
                 "Direct Backpropagation through membrane potential is currently not supported."
             )
+        if grad_output is None:
+            return None, None, None, None, None, None, None
 
-        (v_mem,) = ctx.saved_tensors
+        (surrogates, not_clipped) = _saved_tensors(ctx)
 
-        # Surrogate gradients
-        surrogates = ctx.surrogate_grad_fn(v_mem, ctx.threshold)
-
-        if ctx.min_v_mem is None:
-            not_clipped = torch.ones_like(surrogates)
-        else:
-            # Indicate whether membrane potential (probably) has been clipped
-            not_clipped = v_mem > ctx.min_v_mem
+        if not_clipped is not None:
+            not_clipped = not_clipped.float().contiguous()
         # Gradient wrt. input
-        grad_input = exodus_cuda.spikeBackward(
+        grad_input = ops._cuda_backend("spikeBackward")(
             surrogates.contiguous(),
             grad_output.contiguous(),
-            not_clipped.float().contiguous(),
+            not_clipped,
             ctx.alpha,
             ctx.membrane_subtract,
         )
@@ -116,6 +274,13 @@ class IntegrateAndFire(torch.autograd.Function):
         min_v_mem: float,
         surrogate_grad_fn: Callable,
         max_num_spikes_per_bin: Optional[int] = None,
+        norm_input: bool = False,
+        spike_count: Optional[torch.Tensor] = None,
+        check_inputs: bool = True,
+        v_mem_out: Optional[torch.Tensor] = None,
+        spikes_out: Optional[torch.Tensor] = None,
+        params: Optional[torch.Tensor] = None,
+        v_mem_last_out: Optional[torch.Tensor] = None,
     ):
         """
         Integrate membrane potential with or without leak. Then generate spikes and apply
@@ -126,140 +291,512 @@ class IntegrateAndFire(torch.autograd.Function):
         inp: torch.Tensor
             Input to the layer. Expected shape: (N, T_sim), where N is
             *anything* that can be computed in parallel, i.e. batches, neurons...
-            Has to be contiguous.
+            Alternatively 3D, shape (batch_size, T_sim, N / batch_size), which
+            avoids moving the time dimension of layer inputs. Has to be contiguous.
+            Can be float16 or bfloat16 to reduce memory traffic. Neuron states are
+            evolved in float32 either way.
         alpha : torch.Tensor
             1D shape (N,). State decay factor (exp(-dt/tau)). Set 1 for IAF neurons.
+            Can be a broadcast view, e.g. of a single value for all neurons,
+            which `_pack_params` then packs into a single row.
         v_mem_init : torch.Tensor
-            1D shape (N,).  Initial v_mem (after reset). Has to be contiguous.
-        activations : torch.tensor
-            1D, shape (N,). Activations from previous time step.
-            Has to be contiguous.
+            1D shape (N,).  Initial v_mem (after reset).
         threshold: float
             Firing threshold
-        membrane_subtract: torch.Tensor
-            1D, shape (N,). Value that is subracted from membrane potential after spike
-        min_v_mem: float
-            Lower limit for v_mem
+        membrane_subtract: torch.Tensor or None
+            1D, shape (N,). Value that is subracted from membrane potential after spike.
+            Can be a broadcast view, e.g. of a single value for all neurons,
+            which `_pack_params` then packs into a single row.
+            If None, ``threshold`` is subtracted.
+        min_v_mem: float or None
+            Lower limit for v_mem. If None, v_mem is not clipped.
         surrogate_grad_fn: Callable
-            Calculates surrogate gradients as function of v_mem
+            Calculates surrogate gradients as function of v_mem. Surrogate
+            gradients are evaluated during the forward pass, if any input
+            requires gradients. Can be None if no backward pass is needed,
+            in which case calling backward raises a RuntimeError.
         max_num_spikes_per_bin: int
             Maximum number of neurons that a neuron can emit per time step. Set None to
             remove limit (default).
+        norm_input: bool
+            If True, scale input by (1 - alpha) inside the kernel, before it is
+            integrated. Default: False.
+        spike_count: torch.Tensor or None
+            Scalar int64 tensor, to which the total number of output spikes is
+            added inside the kernel. Default: None.
+        check_inputs: bool
+            If True (default), validate shapes of all inputs and the range of
+            `alpha`. The latter requires a device synchronization, so callers that
+            have already validated their inputs can skip it. The dtype of `inp`
+            is always checked, contiguity always by the CUDA extension.
+        v_mem_out: torch.tensor or None
+            Preallocated, contiguous tensor to which the membrane potentials are
+            written, such that a workspace can be reused between calls. Same
+            shape and dtype as ``inp``. If None (default), a new tensor is created.
+            Must not be reused while the output is still needed, e.g. for the
+            backward pass.
+        spikes_out: torch.tensor or None
+            Preallocated tensor for output spikes, as ``v_mem_out``. Must have
+            the dtype of the returned spikes. Default: None.
+        params: torch.tensor or None
+            Per-neuron parameters, as packed by `_pack_params`, which must match
+            the other arguments. Callers that evolve the same neurons repeatedly
+            can thus pack them only once. If None (default), they are packed at
+            each call.
+        v_mem_last_out: torch.tensor or None
+            float32 tensor of shape (N,), to which the membrane potentials after
+            the last time step, after reset, are written. Unlike the returned
+            membrane potentials, they are not rounded to the dtype of ``inp``,
+            so they can be carried over to the next call. Not differentiable.
+            Default: None.
 
         Returns
         -------
-        torch.tensor (T x T_sim)
-            Membrane potential for each neuron and time step
-        torch.tensor (N x T_sim)
-            Integer spike raster. Same shape as membrane potential
+        torch.tensor
+            Integer spike raster. Same shape as ``inp``. Same dtype as ``inp``, or
+            uint8 if ``max_num_spikes_per_bin`` is at most 255 and no backward
+            pass is prepared, i.e. ``surrogate_grad_fn`` is None or no input
+            requires gradients.
+        torch.tensor
+            Membrane potential for each neuron and time step. Same shape as ``inp``
         """
 
         if membrane_subtract is None:
-            membrane_subtract = torch.ones_like(alpha) * threshold
-
-        if not inp.ndim == 2:
-            raise ValueError("'inp' must be 2D, (N, Time)")
-        if not inp.is_contiguous():
-            raise ValueError("'inp' has to be contiguous.")
-        if not alpha.ndim == 1:
-            raise ValueError("'alpha' must be 1D, (N,)")
-        if not alpha.is_contiguous():
-            raise ValueError("'alpha' has to be contiguous.")
-        if not membrane_subtract.ndim == 1:
-            raise ValueError("'membrane_subtract' must be 1D, (N,)")
-        if not membrane_subtract.is_contiguous():
-            raise ValueError("'membrane_subtract' has to be contiguous.")
-        if not v_mem_init.ndim == 1:
-            raise ValueError("'v_mem_init' must be 1D, (N,)")
-        if not v_mem_init.is_contiguous():
-            raise ValueError("'v_mem_init' has to be contiguous.")
+            membrane_subtract = alpha.new_full((1,), threshold).expand_as(alpha)
 
         if min_v_mem is not None and threshold <= min_v_mem:
             raise ValueError("`threshold` must be greater than `min_v_mem`.")
-        if (alpha < 0).any() or (alpha > 1).any():
-            raise ValueError("'alpha' must be between 0 and 1.")
+        _check_dtype(inp)
+        if check_inputs:
+            _validate_inputs(
+                inp,
+                alpha=alpha,
+                membrane_subtract=membrane_subtract,
+                v_mem_init=v_mem_init,
+            )
+
+        v_mem_init = v_mem_init.float().contiguous()
+        if params is None:
+            params = _pack_params(alpha, membrane_subtract)
 
-        v_mem = torch.empty_like(inp).contiguous()
-        output_spikes = torch.empty_like(inp).contiguous()
+        needs_grad = surrogate_grad_fn is not None and any(ctx.needs_input_grad)
 
-        exodus_cuda.lifForward(
+        v_mem = _output_tensor(v_mem_out, inp, inp.dtype)
+        output_spikes = _output_tensor(
+            spikes_out,
+            inp,
+            _spike_dtype(inp.dtype, max_num_spikes_per_bin, needs_grad),
+        )
+
+        ops.lif_forward(
             output_spikes,
             v_mem,
+            v_mem_last_out,
             inp,
+            params,
             v_mem_init,
-            alpha,
-            membrane_subtract,
             threshold,
             min_v_mem if min_v_mem is not None else 0,
             min_v_mem is not None,
             -1 if max_num_spikes_per_bin is None else max_num_spikes_per_bin,
+            norm_input,
+            spike_count,
         )
 
-        ctx.threshold = threshold
-        ctx.min_v_mem = min_v_mem
-        ctx.surrogate_grad_fn = surrogate_grad_fn
-        # vmem is stored before reset (to calculate surrogate gradients in backward)
-        # however, vmem_initial should already have reset applied
-        if alpha.requires_grad:
-            ctx.save_for_backward(output_spikes, v_mem, v_mem_init, alpha, membrane_subtract)
+        ctx.norm_input = norm_input
+        ctx.inp_dtype = inp.dtype
+        ctx.get_alpha_grads = ctx.needs_input_grad[1]
+        # Gradients of unused outputs are passed to backward as None
+        # rather than as tensors of zeros
+        ctx.set_materialize_grads(False)
+
+        if not needs_grad:
+            return output_spikes, v_mem
+
+        # Surrogate gradients and clipping mask are plain pointwise functions of
+        # vmem before reset. Evaluating them here keeps them in the forward graph,
+        # where they can be fused with other operations, and leaves only the
+        # combination with incoming gradients to the backward pass.
+        # Backward pass is computed in float32, even for reduced precision inputs
+        surrogates = surrogate_grad_fn(v_mem.float(), threshold)
+        # Gradient becomes 0 where v_mem is clipped to lower threshold
+        not_clipped = None if min_v_mem is None else v_mem > min_v_mem
+
+        # vmem_initial should already have reset applied
+        if ctx.get_alpha_grads:
+            # Unscaled input is needed for alpha gradients of the input normalization
+            ctx.save_for_backward(
+                surrogates,
+                not_clipped,
+                alpha,
+                membrane_subtract,
+                output_spikes,
+                v_mem,
+                v_mem_init,
+                inp,
+            )
         else:
-            ctx.save_for_backward(v_mem, alpha, membrane_subtract)
-        ctx.get_alpha_grads = alpha.requires_grad
-        
+            ctx.save_for_backward(surrogates, not_clipped, alpha, membrane_subtract)
+
         return output_spikes, v_mem
 
     @staticmethod
     def backward(ctx, grad_output, grad_v_mem):
 
-        # if (grad_v_mem != 0).any():
-        #     raise NotImplementedError(
-        #         "Direct Backpropagation through membrane potential is currently not supported."
-        #     )
-        
+        if grad_output is None and grad_v_mem is None:
+            return (None,) * 15
+
+        surrogates, not_clipped, alpha, membrane_subtract, *alpha_tensors = (
+            _saved_tensors(ctx)
+        )
+
+        # Without lower bound on v_mem, kernels skip the clipping mask
+        if not_clipped is not None:
+            not_clipped = not_clipped.float()
+
+        # Gradient wrt. vmem before reset
+        grad_v = _grad_v_pre_reset(surrogates, grad_output, grad_v_mem)
+
+        # Gradient wrt. input and, if required, wrt. alpha, in a single pass
+        state = _backward_state(alpha, membrane_subtract)
         if ctx.get_alpha_grads:
-            (output_spikes, v_mem, v_mem_init, alpha, membrane_subtract) = ctx.saved_tensors
+            output_spikes, v_mem, v_mem_init, inp = alpha_tensors
+            v_mem_post = v_mem - neuron_view(membrane_subtract, v_mem) * output_spikes
+            grad_alpha = torch.empty_like(alpha)
+            grad_input = ops.lif_backward(
+                surrogates,
+                grad_v,
+                not_clipped,
+                state,
+                grad_alpha,
+                v_mem_post.float(),
+                v_mem_init,
+            )
         else:
-            (v_mem, alpha, membrane_subtract) = ctx.saved_tensors
+            grad_alpha = None
+            grad_input = ops.lif_backward(surrogates, grad_v, not_clipped, state)
+
+        # Backpropagate one more decay step from first time point.
+        # Works because d v_1 / d inp_1 = 1 and reset on v_mem_ini is done externally.
+        grad_init = alpha * time_step(grad_input, 0)
+
+        if ctx.norm_input:
+            # Input has been scaled by (1 - alpha) inside the kernel
+            if ctx.get_alpha_grads:
+                grad_alpha = grad_alpha - (inp * grad_input).sum(1).reshape(-1)
+            grad_input = neuron_view(1.0 - alpha, grad_input) * grad_input
+
+        grad_input = grad_input.to(ctx.inp_dtype)
+
+        return (
+            grad_input,
+            grad_alpha,
+            grad_init,
+            None,
+            None,
+            None,
+            None,
+            None,
+            None,
+            None,
+            None,
+            None,
+            None,
+            None,
+            None,
+        )
+
+
+class SynapticIntegrateAndFire(torch.autograd.Function):
+    @staticmethod
+    def forward(
+        ctx,
+        inp: torch.tensor,
+        alpha_syn: torch.tensor,
+        i_syn_init: torch.tensor,
+        alpha: torch.tensor,
+        v_mem_init: torch.tensor,
+        threshold: float,
+        membrane_subtract: torch.tensor,
+        min_v_mem: float,
+        surrogate_grad_fn: Callable,
+        max_num_spikes_per_bin: Optional[int] = None,
+        norm_input: bool = False,
+        decay_early: bool = False,
+        spike_count: Optional[torch.Tensor] = None,
+        check_inputs: bool = True,
+        v_mem_out: Optional[torch.Tensor] = None,
+        spikes_out: Optional[torch.Tensor] = None,
+        params: Optional[torch.Tensor] = None,
+        v_mem_last_out: Optional[torch.Tensor] = None,
+    ):
+        """
+        Evolve exponential synapses and integrate-and-fire dynamics in a single
+        kernel, without writing synaptic currents to memory in between. Equivalent
+        to `LeakyIntegrator` followed by `IntegrateAndFire`.
+
+        Parameters
+        ----------
+        inp: torch.Tensor
+            Input to the layer. Expected shape: (N, T_sim), where N is
+            *anything* that can be computed in parallel, i.e. batches, neurons...
+            Alternatively 3D, shape (batch_size, T_sim, N / batch_size). Has to be
+            contiguous. Can be float16 or bfloat16, as for `IntegrateAndFire`.
+        alpha_syn : torch.Tensor
+            1D shape (N,). Synaptic decay factor (exp(-dt/tau_syn)).
+            Can be a broadcast view, e.g. of a single value for all neurons,
+            which `_pack_params` then packs into a single row.
+        i_syn_init : torch.Tensor
+            1D shape (N,). Initial synaptic currents.
+        alpha : torch.Tensor
+            1D shape (N,). Membrane decay factor (exp(-dt/tau_mem)). Set 1 for IAF neurons.
+            Can be a broadcast view, e.g. of a single value for all neurons,
+            which `_pack_params` then packs into a single row.
+        v_mem_init : torch.Tensor
+            1D shape (N,).  Initial v_mem (after reset).
+        threshold: float
+            Firing threshold
+        membrane_subtract: torch.Tensor or None
+            1D, shape (N,). Value that is subracted from membrane potential after spike.
+            Can be a broadcast view, e.g. of a single value for all neurons,
+            which `_pack_params` then packs into a single row.
+            If None, ``threshold`` is subtracted.
+        min_v_mem: float or None
+            Lower limit for v_mem. If None, v_mem is not clipped.
+        surrogate_grad_fn: Callable
+            Calculates surrogate gradients as function of v_mem. Surrogate
+            gradients are evaluated during the forward pass, if any input
+            requires gradients. Can be None if no backward pass is needed,
+            in which case calling backward raises a RuntimeError.
+        max_num_spikes_per_bin: int
+            Maximum number of neurons that a neuron can emit per time step. Set None to
+            remove limit (default).
+        norm_input: bool
+            If True, scale synaptic currents by (1 - alpha) before they are
+            integrated. Default: False.
+        decay_early: bool
+            If True, scale input by alpha_syn before it is added to the synaptic
+            currents. Default: False.
+        spike_count: torch.Tensor or None
+            Scalar int64 tensor, to which the total number of output spikes is
+            added inside the kernel. Default: None.
+        check_inputs: bool
+            If True (default), validate shapes of all inputs and the range of
+            `alpha`. The latter requires a device synchronization, so callers that
+            have already validated their inputs can skip it. The dtype of `inp`
+            is always checked, contiguity always by the CUDA extension.
+        v_mem_out: torch.tensor or None
+            Preallocated, contiguous tensor to which the membrane potentials are
+            written, such that a workspace can be reused between calls. Same
+            shape and dtype as ``inp``. If None (default), a new tensor is created.
+            Must not be reused while the output is still needed, e.g. for the
+            backward pass.
+        spikes_out: torch.tensor or None
+            Preallocated tensor for output spikes, as ``v_mem_out``. Must have
+            the dtype of the returned spikes. Default: None.
+        params: torch.tensor or None
+            Per-neuron parameters, as packed by `_pack_params`, which must match
+            the other arguments. Callers that evolve the same neurons repeatedly
+            can thus pack them only once. If None (default), they are packed at
+            each call.
+        v_mem_last_out: torch.tensor or None
+            float32 tensor of shape (N,), to which the membrane potentials after
+            the last time step, after reset, are written. Unlike the returned
+            membrane potentials, they are not rounded to the dtype of ``inp``,
+            so they can be carried over to the next call. Not differentiable.
+            Default: None.
+
+        Returns
+        -------
+        torch.tensor
+            Integer spike raster. Same shape as ``inp``. Same dtype as ``inp``, or
+            uint8 if ``max_num_spikes_per_bin`` is at most 255 and no backward
+            pass is prepared, i.e. ``surrogate_grad_fn`` is None or no input
+            requires gradients.
+        torch.tensor
+            Membrane potential for each neuron and time step. Same shape as ``inp``
+        torch.tensor
+            Synaptic currents at the last time step. 1D, shape (N,)
+        """
 
-        # Surrogate gradients
-        surrogates = ctx.surrogate_grad_fn(v_mem, ctx.threshold)
+        if membrane_subtract is None:
+            membrane_subtract = alpha.new_full((1,), threshold).expand_as(alpha)
+
+        if min_v_mem is not None and threshold <= min_v_mem:
+            raise ValueError("`threshold` must be greater than `min_v_mem`.")
+        _check_dtype(inp)
+        if check_inputs:
+            _validate_inputs(
+                inp,
+                alpha_syn=alpha_syn,
+                i_syn_init=i_syn_init,
+                alpha=alpha,
+                membrane_subtract=membrane_subtract,
+                v_mem_init=v_mem_init,
+            )
+
+        v_mem_init = v_mem_init.float().contiguous()
+        i_syn_init = i_syn_init.float().contiguous()
+        if params is None:
+            params = _pack_params(alpha, membrane_subtract, alpha_syn)
 
+        needs_grad = surrogate_grad_fn is not None and any(ctx.needs_input_grad)
+
+        v_mem = _output_tensor(v_mem_out, inp, inp.dtype)
+        output_spikes = _output_tensor(
+            spikes_out,
+            inp,
+            _spike_dtype(inp.dtype, max_num_spikes_per_bin, needs_grad),
+        )
+        i_syn_last = torch.empty_like(i_syn_init, dtype=torch.float32)
+        # Synaptic currents over time are only needed for the backward pass
+        i_syn = torch.empty_like(inp) if needs_grad else None
+
+        ops.lif_syn_forward(
+            output_spikes,
+            v_mem,
+            v_mem_last_out,
+            i_syn,
+            i_syn_last,
+            inp,
+            params,
+            v_mem_init,
+            i_syn_init,
+            threshold,
+            min_v_mem if min_v_mem is not None else 0,
+            min_v_mem is not None,
+            -1 if max_num_spikes_per_bin is None else max_num_spikes_per_bin,
+            norm_input,
+            decay_early,
+            spike_count,
+        )
+
+        ctx.norm_input = norm_input
+        ctx.inp_dtype = inp.dtype
+        ctx.decay_early = decay_early
+        ctx.get_alpha_grads = ctx.needs_input_grad[3]
+        ctx.get_alpha_syn_grads = ctx.needs_input_grad[1]
+        ctx.set_materialize_grads(False)
+
+        if not needs_grad:
+            return output_spikes, v_mem, i_syn_last
+
+        # Backward pass is computed in float32, even for reduced precision inputs
+        surrogates = surrogate_grad_fn(v_mem.float(), threshold)
         # Gradient becomes 0 where v_mem is clipped to lower threshold
-        if ctx.min_v_mem is None:
-            not_clipped = torch.ones_like(surrogates)
-        else:
-            not_clipped = (v_mem > ctx.min_v_mem).float()
+        not_clipped = None if min_v_mem is None else v_mem > min_v_mem
 
-        # Gradient wrt. input
-        # Scaling membrane_subtract with alpha compensates for different execution order
-        # in forward pass (i.e. reset happens after spiking and before decay, whereas
-        # backward pass assumes reset to happen after decay)
-        surrogates = surrogates.contiguous()
-        grad_input = exodus_cuda.lifBackward(
+        ctx.save_for_backward(
             surrogates,
-            surrogates * grad_output.contiguous() + grad_v_mem.contiguous(),
-            not_clipped.contiguous(),
-            alpha.contiguous(),
-            alpha * membrane_subtract.contiguous(),
+            not_clipped,
+            alpha,
+            membrane_subtract,
+            alpha_syn,
+            i_syn,
+            # Only needed for alpha gradients
+            output_spikes if ctx.get_alpha_grads else None,
+            v_mem if ctx.get_alpha_grads else None,
+            v_mem_init if ctx.get_alpha_grads else None,
+            # Only needed for alpha_syn gradients
+            i_syn_init if ctx.get_alpha_syn_grads else None,
+            inp if ctx.get_alpha_syn_grads else None,
         )
 
-        # Gradient wrt alpha
+        return output_spikes, v_mem, i_syn_last
+
+    @staticmethod
+    def backward(ctx, grad_output, grad_v_mem, grad_i_syn_last):
+
+        if grad_output is None and grad_v_mem is None and grad_i_syn_last is None:
+            return (None,) * 18
+
+        (
+            surrogates,
+            not_clipped,
+            alpha,
+            membrane_subtract,
+            alpha_syn,
+            i_syn,
+            output_spikes,
+            v_mem,
+            v_mem_init,
+            i_syn_init,
+            inp,
+        ) = _saved_tensors(ctx)
+        i_syn = i_syn.float()
+        # Leaky integrator kernels need one alpha_syn per neuron in memory
+        alpha_syn = alpha_syn.contiguous()
+
+        # Without lower bound on v_mem, kernels skip the clipping mask
+        if not_clipped is not None:
+            not_clipped = not_clipped.float()
+
+        # - Membrane dynamics, as in IntegrateAndFire
+        grad_v = _grad_v_pre_reset(surrogates, grad_output, grad_v_mem)
+        state = _backward_state(alpha, membrane_subtract)
         if ctx.get_alpha_grads:
-            v_mem_post = v_mem - membrane_subtract.unsqueeze(1) * output_spikes
-            grad_alpha = exodus_cuda.lifBackwardAlpha(
+            v_mem_post = v_mem - neuron_view(membrane_subtract, v_mem) * output_spikes
+            grad_alpha = torch.empty_like(alpha)
+            grad_i_mem = ops.lif_backward(
                 surrogates,
-                surrogates * grad_output.contiguous() + grad_v_mem.contiguous(),
-                v_mem_post.contiguous(),
-                v_mem_init.contiguous(),
-                not_clipped.contiguous(),
-                alpha.contiguous(),
-                membrane_subtract.contiguous(),
+                grad_v,
+                not_clipped,
+                state,
+                grad_alpha,
+                v_mem_post.float(),
+                v_mem_init,
             )
         else:
             grad_alpha = None
+            grad_i_mem = ops.lif_backward(surrogates, grad_v, not_clipped, state)
 
-        # Backpropagate one more decay step from first time point.
-        # Works because d v_1 / d inp_1 = 1 and reset on v_mem_ini is done externally.
-        grad_init = alpha * grad_input[:, 0]
+        grad_v_init = alpha * time_step(grad_i_mem, 0)
+
+        if ctx.norm_input:
+            # Synaptic currents have been scaled by (1 - alpha) inside the kernel
+            if ctx.get_alpha_grads:
+                grad_alpha = grad_alpha - (i_syn * grad_i_mem).sum(1).reshape(-1)
+            grad_i_mem = neuron_view(1.0 - alpha, grad_i_mem) * grad_i_mem
+
+        # - Synaptic dynamics, as in LeakyIntegrator
+        if grad_i_syn_last is not None:
+            grad_i_mem[:, -1] += grad_i_syn_last.reshape(grad_i_mem[:, -1].shape)
 
-        return (grad_input, grad_alpha, grad_init, None, None, None, None, None, None)
+        if ctx.get_alpha_syn_grads:
+            grad_alpha_syn = ops.leaky_backward_alpha(
+                grad_i_mem, i_syn, i_syn_init, alpha_syn
+            )
+        else:
+            grad_alpha_syn = None
+
+        grad_input = ops.leaky_backward(grad_i_mem, alpha_syn)
+        grad_i_syn_init = alpha_syn * time_step(grad_input, 0)
+
+        if ctx.decay_early:
+            # Input has been scaled by alpha_syn inside the kernel
+            if ctx.get_alpha_syn_grads:
+                grad_alpha_syn = grad_alpha_syn + (inp * grad_input).sum(1).reshape(-1)
+            grad_input = neuron_view(alpha_syn, grad_input) * grad_input
+
+        grad_input = grad_input.to(ctx.inp_dtype)
+
+        return (
+            grad_input,
+            grad_alpha_syn,
+            grad_i_syn_init,
+            grad_alpha,
+            grad_v_init,
+            None,
+            None,
+            None,
+            None,
+            None,
+            None,
+            None,
+            None,
+            None,
+            None,
+            None,
+            None,
+            None,
+        )
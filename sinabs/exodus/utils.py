@@ -0,0 +1,37 @@
+import torch
+
+
+def neuron_view(per_neuron: torch.Tensor, like: torch.Tensor) -> torch.Tensor:
+    """
+    Reshape a tensor with one entry per neuron such that it broadcasts against
+    a tensor that holds states over time.
+
+    Parameters
+    ----------
+    per_neuron: torch.Tensor
+        1D, shape (N,).
+    like: torch.Tensor
+        States over time. Either 2D, shape (N, T_sim), or 3D, shape
+        (batch_size, T_sim, N / batch_size).
+
+    Returns
+    -------
+    torch.tensor
+        `per_neuron` reshaped to (N, 1) or (batch_size, 1, N / batch_size)
+    """
+    if like.ndim == 3:
+        return per_neuron.reshape(like.shape[0], 1, like.shape[2])
+    return per_neuron.unsqueeze(1)
+
+
+def time_step(states: torch.Tensor, t: int) -> torch.Tensor:
+    """
+    Select time step `t` from a 2D (N, T_sim) or 3D (batch_size, T_sim, N / batch_size)
+    tensor of states over time.
+
+    Returns
+    -------
+    torch.tensor
+        1D, shape (N,)
+    """
+    return states[:, t].reshape(-1)
@@ -25,13 +25,15 @@ def test_leakyintegrator():
         assert p.grad is not None
 
 
-def test_compare_leakyintegrator_backward():
+# Few neurons with long time series are evolved with a parallel scan over time,
+# otherwise sequentially, one thread per neuron.
+@pytest.mark.parametrize(
+    "batchsize,n_neurons,time_steps", [(10, 8, 100), (10, 8, 20), (64, 512, 100)]
+)
+def test_compare_leakyintegrator_backward(batchsize, n_neurons, time_steps):
 
     torch.manual_seed(1)
 
-    time_steps = 100
-    batchsize = 10
-    n_neurons = 8
     num_epochs = 3
 
     # Input data and initialization
@@ -1,9 +1,12 @@
+import copy
+import io
 import time
 from itertools import product
 import pytest
 import torch
 import torch.nn as nn
 import sinabs.exodus.layers as el
+from sinabs.exodus import ops
 import sinabs.layers as sl
 import sinabs.activation as sa
 
@@ -54,6 +57,244 @@ def test_min_v_mem():
     assert not (layer.v_mem < -0.5).any()
 
 
+def test_firing_rate_without_grads():
+    batch_size, time_steps = 10, 100
+    tau_mem = torch.tensor(30.0)
+    alpha = torch.exp(-1 / tau_mem)
+    input_current = torch.rand(batch_size, time_steps, 2, 7, 7).cuda() / (1 - alpha)
+    layer = el.LIF(tau_mem=tau_mem).cuda()
+
+    spike_output = layer(input_current)
+    firing_rate = layer.firing_rate
+    v_mem = layer.v_mem
+    layer.reset_states()
+    # Without grads, spikes are counted inside the kernel
+    with torch.no_grad():
+        layer(input_current)
+
+    assert torch.allclose(layer.firing_rate, firing_rate)
+    assert torch.allclose(firing_rate, spike_output.mean())
+    assert torch.allclose(layer.v_mem, v_mem)
+
+
+@pytest.mark.parametrize("grad_enabled", (True, False))
+def test_firing_rate_float16(grad_enabled):
+    batch_size, time_steps = 10, 100
+    input_current = torch.full(
+        (batch_size, time_steps, 2, 7, 7), 1e3, dtype=torch.float16
+    ).cuda()
+    layer = el.LIF(tau_mem=torch.tensor(30.0), spike_fn=sa.SingleSpike).cuda()
+
+    # Without grads, spikes are counted inside the kernel
+    with torch.set_grad_enabled(grad_enabled):
+        spike_output = layer(input_current)
+
+    # More spikes than float16 can represent
+    assert spike_output.float().sum() > 65504
+    assert layer.firing_rate.dtype == torch.float16
+    assert torch.isfinite(layer.firing_rate)
+    assert torch.allclose(layer.firing_rate.float(), spike_output.float().mean())
+
+
+@pytest.mark.parametrize("tau_syn", (None, 10.0))
+def test_cuda_graphs(tau_syn):
+    batch_size, time_steps = 10, 20
+    tau_mem = torch.tensor(30.0)
+    alpha = torch.exp(-1 / tau_mem)
+    inputs = [
+        torch.rand(batch_size, time_steps, 2, 7, 7).cuda() / (1 - alpha)
+        for _ in range(4)
+    ]
+
+    layer = el.LIF(tau_mem=tau_mem, tau_syn=tau_syn).cuda()
+    layer_graphed = el.LIF(tau_mem=tau_mem, tau_syn=tau_syn, use_cuda_graphs=True).cuda()
+
+    # First call runs eagerly, second one captures the graph, others replay it
+    with torch.no_grad():
+        for input_current in inputs:
+            spike_output = layer(input_current)
+            spike_output_graphed = layer_graphed(input_current)
+
+            assert torch.allclose(spike_output, spike_output_graphed)
+            assert torch.allclose(layer.v_mem, layer_graphed.v_mem, atol=atol, rtol=rtol)
+            assert torch.allclose(layer.firing_rate, layer_graphed.firing_rate)
+
+    assert len(layer_graphed._graph_cache) == 1
+
+    # Captured graphs are neither copied nor pickled
+    layer_copy = copy.deepcopy(layer_graphed)
+    assert layer_copy.use_cuda_graphs
+    assert len(layer_copy._graph_cache) == 0
+    torch.save(layer_graphed, io.BytesIO())
+    assert len(layer_graphed._graph_cache) == 1
+
+    layer_copy.reset_states()
+    layer.reset_states()
+    with torch.no_grad():
+        for input_current in inputs:
+            spike_output = layer(input_current)
+            assert torch.allclose(spike_output, layer_copy(input_current))
+
+
+def test_cuda_graphs_reconfigured():
+    batch_size, time_steps = 10, 20
+    tau_mem = torch.tensor(30.0)
+    input_current = torch.rand(batch_size, time_steps, 2, 7, 7).cuda() * 100
+
+    layer = el.LIF(tau_mem=tau_mem).cuda()
+    layer_graphed = el.LIF(tau_mem=tau_mem, use_cuda_graphs=True).cuda()
+
+    with torch.no_grad():
+        # Capture graph, then change settings that are baked into it
+        for _ in range(3):
+            layer_graphed(input_current)
+        layer_graphed.reset_states()
+        for lyr in (layer, layer_graphed):
+            lyr.spike_fn = sa.SingleSpike
+            lyr.max_num_spikes_per_bin = 1
+
+        for _ in range(3):
+            spike_output = layer(input_current)
+            spike_output_graphed = layer_graphed(input_current)
+            assert spike_output_graphed.max() == 1
+            assert torch.allclose(spike_output, spike_output_graphed)
+
+    # Inputs of a new shape replace the previous graph
+    with torch.no_grad():
+        layer_graphed(input_current[:, :10])
+    assert len(layer_graphed._graph_cache) == 1
+
+    layer_graphed.release_workspaces()
+    assert len(layer_graphed._graph_cache) == 0
+
+
+@pytest.mark.parametrize("spike_fn", (sa.SingleSpike, sa.MultiSpike))
+def test_workspaces(spike_fn):
+    batch_size, time_steps = 10, 100
+    tau_mem = torch.tensor(30.0)
+    alpha = torch.exp(-1 / tau_mem)
+    inputs = [
+        torch.rand(batch_size, time_steps, 2, 7, 7).cuda() / (1 - alpha)
+        for _ in range(3)
+    ]
+
+    layer = el.LIF(tau_mem=tau_mem, spike_fn=spike_fn).cuda()
+    with torch.no_grad():
+        outputs = [layer(inp) for inp in inputs]
+        outputs_copy = [out.clone() for out in outputs]
+
+    # Workspaces are reused, without overwriting earlier outputs
+    assert layer._ws_vmem is not None
+    for out, out_copy in zip(outputs, outputs_copy):
+        assert torch.equal(out, out_copy)
+
+    v_mem = layer.v_mem.clone()
+    layer.reset_states()
+    layer.release_workspaces()
+    # Same results with autograd, where no workspaces are used
+    for inp, out in zip(inputs, outputs):
+        assert torch.equal(layer(inp), out)
+    assert torch.allclose(layer.v_mem, v_mem, atol=atol, rtol=rtol)
+
+
+@pytest.mark.parametrize("tau_syn", (None, 10.0))
+def test_workspaces_after_training(tau_syn):
+    batch_size, time_steps = 10, 100
+    input_data = torch.rand(batch_size, time_steps, 2, 7, 7).cuda() * 2
+
+    layer = el.LIF(
+        tau_mem=30.0, tau_syn=tau_syn, spike_fn=sa.SingleSpike, train_alphas=True
+    ).cuda()
+    layer(input_data).sum().backward()
+    assert layer.v_mem.requires_grad
+
+    # States from training and trainable alphas require gradients, but spikes
+    # are not differentiated and can be written to the uint8 workspace
+    with torch.no_grad():
+        output = layer(input_data)
+    assert output.dtype == input_data.dtype
+    assert layer._ws_spk.dtype == torch.uint8
+
+
+def test_compile_epilogue():
+    batch_size, time_steps = 10, 100
+    tau_mem = torch.tensor(30.0)
+    alpha = torch.exp(-1 / tau_mem)
+    input_current = torch.rand(batch_size, time_steps, 2, 7, 7).cuda() / (1 - alpha)
+
+    layer = el.LIF(tau_mem=tau_mem).cuda()
+    layer_compiled = el.LIF(tau_mem=tau_mem, compile_epilogue=True).cuda()
+    spike_output = layer(input_current)
+    spike_output_compiled = layer_compiled(input_current)
+
+    assert torch.equal(spike_output, spike_output_compiled)
+    assert torch.allclose(layer.v_mem, layer_compiled.v_mem, atol=atol, rtol=rtol)
+    assert torch.allclose(layer.firing_rate, layer_compiled.firing_rate)
+
+
+@pytest.mark.parametrize("compute_dtype", (torch.float16, torch.bfloat16))
+def test_reduced_precision(compute_dtype):
+    batch_size, time_steps = 10, 100
+    tau_mem = torch.tensor(30.0)
+    alpha = torch.exp(-1 / tau_mem)
+    input_current = torch.rand(batch_size, time_steps, 2, 7, 7).cuda() / (1 - alpha)
+
+    layer = el.LIF(tau_mem=tau_mem).cuda()
+    layer_reduced = el.LIF(tau_mem=tau_mem, compute_dtype=compute_dtype).cuda()
+    with torch.no_grad():
+        spike_output = layer(input_current)
+        spike_output_reduced = layer_reduced(input_current)
+
+    assert spike_output_reduced.dtype == input_current.dtype
+    assert layer_reduced.v_mem.dtype == torch.float32
+    # Rounding of inputs can shift single spikes
+    assert (spike_output != spike_output_reduced).float().mean() < 0.01
+
+    # States carried over to the next call are not rounded to `compute_dtype`.
+    # Inputs are exactly representable in the reduced dtype.
+    input_exact = torch.randint(0, 64, input_current.shape).cuda() / 64
+    layer.reset_states()
+    layer_reduced.reset_states()
+    with torch.no_grad():
+        layer(input_exact)
+        layer_reduced(input_exact)
+    assert torch.equal(layer.v_mem, layer_reduced.v_mem)
+
+
+@pytest.mark.skipif(ops.lif_numba is None, reason="numba is not installed")
+def test_lif_cpu():
+    batch_size, time_steps, n_neurons = 10, 100, 20
+    tau_mem = 20.0
+    sinabs_layer = sl.LIF(tau_mem=tau_mem, min_v_mem=-1)
+    exodus_layer = el.LIF(tau_mem=tau_mem, min_v_mem=-1)
+    input_data = torch.rand((batch_size, time_steps, n_neurons)) * 2
+    spike_output_sinabs = sinabs_layer(input_data)
+    spike_output_exodus = exodus_layer(input_data)
+
+    assert spike_output_sinabs.sum() > 0
+    assert torch.equal(spike_output_sinabs, spike_output_exodus)
+    assert torch.allclose(sinabs_layer.v_mem, exodus_layer.v_mem, atol=atol, rtol=rtol)
+
+
+@pytest.mark.parametrize("kwargs", (dict(tau_syn=10.0), dict(spike_fn=None)))
+def test_cuda_only_layers_on_cpu(kwargs):
+    layer = el.LIF(tau_mem=20.0, **kwargs)
+    input_data = torch.rand((2, 10, 4))
+
+    # Synaptic and non-spiking dynamics are only implemented for CUDA tensors
+    with pytest.raises(RuntimeError, match="CUDA"):
+        layer(input_data)
+
+
+def test_unsupported_dtype():
+    layer = el.LIF(tau_mem=torch.tensor(30.0)).cuda()
+    input_data = torch.rand((2, 10, 4), dtype=torch.float64).cuda()
+
+    # The layer skips most input checks, but not the dtype check
+    with pytest.raises(ValueError, match="dtype"):
+        layer(input_data)
+
+
 def test_state_reset():
     batch_size, time_steps = 10, 100
     tau_mem = torch.tensor(30.0)
@@ -418,6 +659,71 @@ def test_exodus_vs_sinabs_compare_grads_single_layer(train_alphas, norm_input, t
         assert torch.abs(scale - 1) < 2e-2, f"Relative scale is {scale}"
 
 
+@pytest.mark.parametrize("train_alphas,tau_syn", product((True, False), (None, 30.0)))
+def test_scalar_time_constants(train_alphas, tau_syn):
+    batch_size, time_steps = 2, 10
+    n_channels = 16
+    tau_mem = 20.0
+    kwargs = dict(spike_threshold=1, min_v_mem=-1, train_alphas=train_alphas)
+
+    # Single time constants for all neurons are not materialized per neuron
+    layer_scalar = el.LIF(
+        tau_mem=torch.tensor(tau_mem),
+        tau_syn=None if tau_syn is None else torch.tensor(tau_syn),
+        **kwargs,
+    ).cuda()
+    layer_channel = el.LIF(
+        tau_mem=torch.full((n_channels,), tau_mem),
+        tau_syn=None if tau_syn is None else torch.full((n_channels,), tau_syn),
+        **kwargs,
+    ).cuda()
+
+    input_data = torch.rand((batch_size, time_steps, n_channels)).cuda() * 2
+    out_scalar = layer_scalar(input_data)
+    out_channel = layer_channel(input_data)
+    assert torch.equal(out_scalar, out_channel)
+    # Parameters are packed once per neuron of a sample, not per batch
+    assert layer_scalar._state_pack.shape == (1, 4)
+    assert layer_channel._state_pack.shape == (n_channels, 4)
+    assert torch.allclose(layer_scalar.v_mem, layer_channel.v_mem, atol=atol, rtol=rtol)
+
+    out_scalar.sum().backward()
+    out_channel.sum().backward()
+    params_channel = dict(layer_channel.named_parameters())
+    for name, param in layer_scalar.named_parameters():
+        grad_channel = params_channel[name].grad
+        assert torch.allclose(param.grad, grad_channel.sum(), atol=atol, rtol=rtol)
+
+
+@pytest.mark.parametrize("tau_syn", (None, 10.0))
+def test_state_pack(tau_syn):
+    batch_size, time_steps, n_neurons = 2, 10, 16
+    layer = el.LIF(
+        tau_mem=torch.full((n_neurons,), 20.0), tau_syn=tau_syn, norm_input=False
+    ).cuda()
+    input_data = torch.rand((batch_size, time_steps, n_neurons)).cuda() * 2
+
+    with torch.no_grad():
+        layer(input_data)
+        state_pack = layer._state_pack
+        version = state_pack._version
+
+        # Not refilled as long as parameters are unchanged
+        layer(input_data)
+        assert layer._state_pack is state_pack
+        assert state_pack._version == version
+
+        # Refilled in place after time constants have been modified
+        layer.tau_mem.fill_(10.0)
+        layer.reset_states()
+        output = layer(input_data)
+        assert layer._state_pack is state_pack
+        assert torch.allclose(state_pack[:, 0], torch.exp(-1 / layer.tau_mem))
+
+        layer_new = el.LIF(tau_mem=10.0, tau_syn=tau_syn, norm_input=False).cuda()
+        assert torch.equal(output, layer_new(input_data))
+
+
 def test_exodus_vs_sinabs_compare_grads_single_layer_simplified():
     batch_size, time_steps = 1, 20
     n_channels = 1
@@ -480,6 +786,45 @@ def test_exodus_vs_sinabs_compare_grads_single_layer_simplified():
     assert torch.allclose(exodus_grads, sinabs_grads, atol=atol, rtol=rtol)
 
 
+args = product((True, False), (True, False), (True, False))
+@pytest.mark.parametrize("train_alphas,norm_input,decay_early", args)
+def test_fused_synaptic_dynamics(train_alphas, norm_input, decay_early):
+    # Without recordings, synaptic and membrane dynamics are evolved in one kernel
+    batch_size, time_steps, n_channels = 2, 10, 16
+    kwargs = dict(
+        tau_mem=torch.ones((n_channels,)) * 20.0,
+        tau_syn=torch.ones((n_channels,)) * 10.0,
+        min_v_mem=-1,
+        norm_input=norm_input,
+        train_alphas=train_alphas,
+        decay_early=decay_early,
+    )
+    fused_model = el.LIF(**kwargs, record_states=False).cuda()
+    sequential_model = el.LIF(**kwargs, record_states=True).cuda()
+
+    input_data = torch.rand((batch_size, time_steps, n_channels)).cuda() * 3
+    initial_state_v_mem = torch.rand_like(input_data[:, 0])
+    initial_state_i_syn = torch.rand_like(input_data[:, 0])
+
+    outputs = []
+    grads = []
+    for model in (fused_model, sequential_model):
+        model.v_mem = initial_state_v_mem.clone()
+        model.i_syn = initial_state_i_syn.clone()
+        inp = input_data.clone().requires_grad_(True)
+        out = model(inp)
+        loss = torch.nn.functional.mse_loss(out, torch.ones_like(out))
+        loss = loss + model.v_mem.sum() + model.i_syn.sum()
+        loss.backward()
+        outputs.append((out, model.v_mem, model.i_syn))
+        grads.append([inp.grad] + [p.grad for p in model.parameters()])
+
+    for fused, sequential in zip(*outputs):
+        assert torch.allclose(fused, sequential, atol=atol, rtol=rtol)
+    for fused, sequential in zip(*grads):
+        assert torch.allclose(fused, sequential, atol=1e-6, rtol=rtol)
+
+
 class SinabsLIFModel(nn.Sequential):
     def __init__(
         self,
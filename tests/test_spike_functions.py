@@ -1,6 +1,7 @@
 import pytest
 import torch
-from sinabs.exodus.spike import IntegrateAndFire
+from sinabs.exodus import ops
+from sinabs.exodus.spike import IntegrateAndFire, SpikeFunction
 from sinabs import activation as sa
 from sinabs.layers.functional.lif import lif_forward
 
@@ -47,11 +48,75 @@ def test_integratefire_backprop_vmem():
     )
 
 
-args = ("spikes", "vmem", "sum")
+def test_integratefire_backprop_without_surrogates():
+    inp = torch.rand((2, 10), requires_grad=True, device="cuda")
+    v_mem_initial = torch.zeros(2, device="cuda")
+    alpha = torch.full_like(v_mem_initial, 0.9)
+    membrane_subtract = torch.ones_like(v_mem_initial)
+
+    out, v_mem = IntegrateAndFire.apply(
+        inp, alpha, v_mem_initial, 1.0, membrane_subtract, None, None
+    )
+
+    with pytest.raises(RuntimeError, match="surrogate_grad_fn"):
+        out.sum().backward()
+
+
+def test_spikefunction_zero_vmem_grad():
+    v_mem = torch.rand((2, 10), device="cuda") * 3
+    args = (1.0, 0.9, sa.Heaviside(0), 1.0)
 
+    out, v_mem_out = SpikeFunction.apply(v_mem.detach().requires_grad_(True), *args)
+    # Backpropagating zero gradients through v_mem is fine
+    (out.sum() + 0 * v_mem_out.sum()).backward()
 
+    out, v_mem_out = SpikeFunction.apply(v_mem.detach().requires_grad_(True), *args)
+    with pytest.raises(NotImplementedError):
+        (out.sum() + v_mem_out.sum()).backward()
+
+
+def test_integratefire_uint8_spikes():
+    inp = torch.rand((2, 100), device="cuda") * 3
+    v_mem_initial = torch.zeros(2, device="cuda")
+    alpha = torch.full_like(v_mem_initial, 0.9)
+    membrane_subtract = torch.ones_like(v_mem_initial)
+    args = (inp, alpha, v_mem_initial, 1.0, membrane_subtract, None, None, 2)
+
+    # Without gradients and with at most 255 spikes per bin, spikes are uint8
+    out_uint8, v_mem_uint8 = IntegrateAndFire.apply(*args)
+    assert out_uint8.dtype == torch.uint8
+
+    # Inputs, such as trainable alphas, can require gradients even when autograd
+    # is not recording, as indicated by a missing surrogate gradient function
+    with torch.no_grad():
+        out, _ = IntegrateAndFire.apply(
+            inp, alpha.clone().requires_grad_(True), *args[2:]
+        )
+    assert out.dtype == torch.uint8
+
+    grad_args = (inp.requires_grad_(True), *args[1:6], sa.Heaviside(0), args[7])
+    out, v_mem = IntegrateAndFire.apply(*grad_args)
+    assert out.dtype == inp.dtype
+    assert (out_uint8 == out).all()
+    assert (v_mem_uint8 == v_mem).all()
+
+
+args = ("spikes", "vmem", "sum")
+devices = (
+    "cuda",
+    # CPU fallback is only available with numba
+    pytest.param(
+        "cpu",
+        marks=pytest.mark.skipif(
+            ops.lif_numba is None, reason="numba is not installed"
+        ),
+    ),
+)
+
+
+@pytest.mark.parametrize("device", devices)
 @pytest.mark.parametrize("backward_var", args)
-def test_compare_integratefire(backward_var):
+def test_compare_integratefire(backward_var, device):
 
     torch.manual_seed(1)
 
@@ -68,12 +133,12 @@ def test_compare_integratefire(backward_var):
     input_sinabs = torch.rand(
         (num_epochs, batchsize, time_steps, n_neurons),
         requires_grad=True,
-        device="cuda",
+        device=device,
     )
     v_mem_init_sinabs = torch.rand(
-        batchsize, n_neurons, requires_grad=True, device="cuda"
+        batchsize, n_neurons, requires_grad=True, device=device
     )
-    alpha_sinabs = torch.rand(n_neurons, requires_grad=True, device="cuda")
+    alpha_sinabs = torch.rand(n_neurons, requires_grad=True, device=device)
 
     # Copy data without connecting gradients
     input_exodus = input_sinabs.clone().detach().requires_grad_(True)